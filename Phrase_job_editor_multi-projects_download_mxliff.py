@@ -1,74 +1,39 @@
 import tkinter as tk
 from tkinter import messagebox, ttk, filedialog
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-import concurrent.futures
+import collections
 import logging
-import time
-import json
 import os
-import sys
-from datetime import datetime, timezone
-
-# 設置日誌記錄(考慮打包後的路徑)
-if getattr(sys, 'frozen', False):
-    BASE_DIR = os.path.dirname(sys.executable)
-else:
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-logging.basicConfig(
-    filename=os.path.join(BASE_DIR, 'job_status_update.log'),
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+import queue
+import threading
+
+import phrase_core as core
+
+# 設置日誌記錄:寫入檔案由背景執行緒負責,不拖慢工作執行緒
+core.configure_logging()
 
 # 全域變數
-BASE_URL = "https://cloud.memsource.com/web"
-API_TOKEN = None
-HEADERS = None
-CREDENTIALS_FILE = os.path.join(BASE_DIR, "credentials.json")
 selected_projects_global = []
 selected_target_langs = []  # 新增:儲存選定的目標語言
-
-
-def save_credentials(username, token, expires):
-    """ 儲存帳號、token 和過期時間到檔案(不儲存密碼) """
-    try:
-        credentials = {
-            "username": username,
-            "token": token,
-            "expires": expires
-        }
-        with open(CREDENTIALS_FILE, 'w') as f:
-            json.dump(credentials, f)
-        logging.info("Credentials saved to file")
-    except Exception as e:
-        logging.error(f"Failed to save credentials: {type(e).__name__} - {str(e)}")
-        messagebox.showerror("Error", f"無法儲存憑證: {str(e)}")
-
-
-def load_credentials():
-    """ 從檔案載入帳號、token 和過期時間(不載入密碼) """
-    try:
-        if os.path.exists(CREDENTIALS_FILE):
-            with open(CREDENTIALS_FILE, 'r') as f:
-                credentials = json.load(f)
-            return credentials
-    except (json.JSONDecodeError, IOError) as e:
-        logging.error(f"Failed to load credentials: {type(e).__name__} - {str(e)}")
-    return None
-
-
-def is_token_valid(expires):
-    """ 檢查 token 是否過期 """
-    if not expires:
-        return False
-    try:
-        expire_time = datetime.fromisoformat(expires.replace('Z', '+00:00'))
-        current_time = datetime.now(timezone.utc)
-        return current_time < expire_time
-    except ValueError:
-        return False
+UI_POLL_INTERVAL_MS = 100  # GUI 檢查背景工作進度、批次更新訊息區的間隔
+LOG_VIEW_MAX_LINES = 2000  # 訊息區只保留最新的行數
+pending_log = collections.deque(maxlen=LOG_VIEW_MAX_LINES)  # 尚未顯示的訊息,超過上限時捨棄最舊的
+ui_queue = queue.Queue()  # 背景執行緒送給 GUI 的更新,由 poll_ui_queue 在主執行緒套用
+cancel_event = threading.Event()  # 使用者按下「取消」後設定,背景工作據此停止送出新請求
+worker_thread = None
+interrupted_update = None  # token 過期而中斷的狀態更新參數,重新登入後可從記錄繼續
+
+
+def enable_logged_in(status_text):
+    """ 登入成功後啟用需要登入的元件 """
+    entry_project.config(state="normal")
+    entry_client.config(state="normal")
+    combo_workflow.config(state="normal")
+    combo_status.config(state="normal")
+    button_search.config(state="normal")
+    button_show_jobs.config(state="normal")
+    button_update_status.config(state="normal")
+    button_download_bilingual.config(state="normal")
+    label_login_status.config(text=status_text, foreground="green")
 
 
 def login():
@@ -79,163 +44,99 @@ def login():
         messagebox.showerror("Error", "請輸入帳號和密碼")
         return False
 
-    url = f"{BASE_URL}/api2/v1/auth/login"
-    payload = {
-        "userName": username,
-        "password": password
-    }
     try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        data = response.json()
-        global API_TOKEN, HEADERS
-        API_TOKEN = data["token"]
-        HEADERS = {
-            "Authorization": f"ApiToken {API_TOKEN}",
-            "Content-Type": "application/json"
-        }
-        save_credentials(username, API_TOKEN, data["expires"])
-        entry_project.config(state="normal")
-        combo_workflow.config(state="normal")
-        combo_status.config(state="normal")
-        button_search.config(state="normal")
-        button_show_jobs.config(state="normal")
-        button_update_status.config(state="normal")
-        button_download_bilingual.config(state="normal")  # 新增
-        label_login_status.config(text="登入成功", foreground="green")
-        logging.info(f"Login successful for user: {username}")
-        return True
-    except requests.exceptions.HTTPError as http_err:
-        messagebox.showerror("Error", f"登入失敗: 帳號密碼錯誤或帳號未啟用")
-        logging.error(f"Login failed: {http_err}")
-        return False
-    except requests.exceptions.RequestException as req_err:
-        messagebox.showerror("Error", f"網路錯誤: {req_err}")
-        logging.error(f"Login failed: {req_err}")
+        core.login(username, password)
+    except core.PhraseError as e:
+        messagebox.showerror("Error", str(e))
         return False
+    enable_logged_in("登入成功")
+    resume_interrupted_update()
+    return True
 
 
-def list_projects(project_name=None, client_name=None):
-    """查詢包含指定條件的所有專案(自動抓取所有分頁),並取得 targetLangs"""
-    global API_TOKEN, HEADERS
-    url = f"{BASE_URL}/api2/v1/projects"
-    params = {"pageNumber": 0, "pageSize": 50}
-    projects_all = []
+def show_logged_out():
+    """ 在主執行緒顯示 Token 過期訊息並停用需要登入的元件 """
+    messagebox.showerror("Error", "Token 已過期,請重新登入")
+    entry_project.config(state="disabled")
+    entry_client.config(state="disabled")
+    combo_workflow.config(state="disabled")
+    combo_status.config(state="disabled")
+    button_search.config(state="disabled")
+    button_show_jobs.config(state="disabled")
+    button_update_status.config(state="disabled")
+    button_download_bilingual.config(state="disabled")
+    label_login_status.config(text="未登入", foreground="red")
 
-    if project_name:
-        params["name"] = project_name
-    if client_name:
-        params["clientName"] = client_name
 
-    while True:
-        try:
-            response = requests.get(url, headers=HEADERS, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            # 累積每一頁的結果,並保留 targetLangs 資訊
-            for project in data.get("content", []):
-                # 確保 targetLangs 資訊被保留
-                if 'targetLangs' not in project:
-                    project['targetLangs'] = []
-                projects_all.append(project)
-
-            total_pages = data.get("totalPages", 1)
-            if params["pageNumber"] >= total_pages - 1:
-                break
-            params["pageNumber"] += 1
-
-        except requests.exceptions.HTTPError as http_err:
-            if http_err.response.status_code == 401:
-                messagebox.showerror("Error", "Token 已過期,請重新登入")
-                API_TOKEN = None
-                HEADERS = None
-                entry_project.config(state="disabled")
-                entry_client.config(state="disabled")
-                combo_workflow.config(state="disabled")
-                combo_status.config(state="disabled")
-                button_search.config(state="disabled")
-                button_show_jobs.config(state="disabled")
-                button_update_status.config(state="disabled")
-                button_download_bilingual.config(state="disabled")
-                label_login_status.config(text="未登入", foreground="red")
-                raise Exception("Token expired")
-            raise Exception(f"Failed to list projects: {http_err}")
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to list projects: {e}")
-
-    return projects_all
-
-
-def list_jobs(project_uid, workflowLevel=None, targetLang=None):
-    """ 抓取指定 project 的 jobs,可依 workflowLevel 和 targetLang 篩選
-        如果 workflowLevel=None,則抓取所有 jobs
-        如果 targetLang 有指定,則只回傳該語系的 jobs
-    """
-    global API_TOKEN, HEADERS
-    jobs_all = []
-    page = 0
-    while True:
-        url = f"{BASE_URL}/api2/v1/projects/{project_uid}/jobs"
-        params = {"pageNumber": page}
-        if workflowLevel:
-            params["workflowLevel"] = workflowLevel
-        if targetLang:
-            params["targetLang"] = targetLang
-        try:
-            response = requests.get(url, headers=HEADERS, params=params)
-            response.raise_for_status()
-            data = response.json()
-            jobs = data.get("content", [])
-            jobs_all.extend(jobs)
-            total_pages = data.get("totalPages", 1)
-            if page >= total_pages - 1:
-                break
-            page += 1
-        except requests.exceptions.HTTPError as http_err:
-            if http_err.response.status_code == 401:
-                messagebox.showerror("Error", "Token 已過期,請重新登入")
-                API_TOKEN = None
-                HEADERS = None
-                entry_project.config(state="disabled")
-                combo_workflow.config(state="disabled")
-                combo_status.config(state="disabled")
-                button_search.config(state="disabled")
-                button_show_jobs.config(state="disabled")
-                button_update_status.config(state="disabled")
-                button_download_bilingual.config(state="disabled")
-                label_login_status.config(text="未登入", foreground="red")
-                raise Exception("Token expired")
-            raise Exception(f"Failed to list jobs: {http_err}")
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to list jobs: {e}")
-    return jobs_all
-
-
-def download_bilingual_file(project_uid, job_uids, save_path):
-    """ 下載雙語檔案 """
-    global API_TOKEN, HEADERS
-    url = f"{BASE_URL}/api2/v1/projects/{project_uid}/jobs/bilingualFile"
-
-    # 建立 payload
-    jobs_list = [{"uid": uid} for uid in job_uids]
-    payload = {"jobs": jobs_list}
+def post_ui(func, *args):
+    """ 排入要在 Tk 主執行緒執行的 GUI 更新(可由任何執行緒呼叫) """
+    ui_queue.put((func, args))
+
 
+def append_text(text):
+    """ 將訊息排入 text_jobs,由 poll_ui_queue 批次顯示(可由任何執行緒呼叫) """
+    pending_log.append(text)
+
+
+def flush_log_view():
+    """ 一次插入所有待顯示的訊息,並刪除超過 LOG_VIEW_MAX_LINES 的舊行 """
+    if not pending_log:
+        return
+    text_jobs.insert(tk.END, "".join(pending_log.popleft() for _ in range(len(pending_log))))
+    line_count = int(text_jobs.index("end-1c").split(".")[0])
+    if line_count > LOG_VIEW_MAX_LINES:
+        text_jobs.delete("1.0", f"{line_count - LOG_VIEW_MAX_LINES + 1}.0")
+    text_jobs.see(tk.END)  # 自動捲動到最新訊息
+
+
+def poll_ui_queue():
+    """ 在主執行緒批次顯示訊息、套用背景工作送來的 GUI 更新,並定期重新排程自己 """
+    flush_log_view()
     try:
-        response = requests.post(url, json=payload, headers=HEADERS)
-        response.raise_for_status()
-
-        # 儲存檔案
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
-
-        return f"成功下載到: {save_path}"
-    except requests.exceptions.HTTPError as http_err:
-        return f"HTTP error: {http_err}"
-    except requests.exceptions.RequestException as req_err:
-        return f"Request error: {req_err}"
-    except Exception as e:
-        return f"Error: {str(e)}"
+        while True:
+            func, args = ui_queue.get_nowait()
+            func(*args)
+    except queue.Empty:
+        pass
+    root.after(UI_POLL_INTERVAL_MS, poll_ui_queue)
+
+
+def set_task_running(running):
+    """ 背景工作執行中時停用會啟動新工作的按鈕,並啟用「取消」按鈕 """
+    action_state = "disabled" if running or not core.CLIENT.token else "normal"
+    button_update_status.config(state=action_state)
+    button_download_bilingual.config(state=action_state)
+    button_cancel.config(state="normal" if running else "disabled")
+
+
+def start_background_task(target, *args):
+    """ 在背景執行緒執行耗時作業,避免 GUI 凍結 """
+    global worker_thread
+    if worker_thread is not None and worker_thread.is_alive():
+        messagebox.showerror("Error", "已有作業正在執行")
+        return
+    cancel_event.clear()
+    set_task_running(True)
+
+    def run():
+        try:
+            target(*args)
+        except Exception as e:
+            append_text(f"Error: {str(e)}\n")
+            logging.error(f"Background task {target.__name__} failed: {str(e)}")
+        finally:
+            post_ui(set_task_running, False)
+
+    worker_thread = threading.Thread(target=run, name=target.__name__, daemon=True)
+    worker_thread.start()
+
+
+def cancel_task():
+    """ 取消執行中的背景工作:不再送出新請求,並盡快結束進行中的請求 """
+    cancel_event.set()
+    button_cancel.config(state="disabled")
+    append_text("正在取消...\n")
+    logging.info("Cancellation requested")
 
 
 def select_target_languages():
@@ -294,22 +195,9 @@ def select_target_languages():
     tk.Button(button_frame, text="取消", command=on_cancel).pack(side=tk.LEFT, padx=5)
 
 
-def get_unique_filename(directory, filename):
-    """ 如果檔名重複，自動加上編號 (1), (2), (3)... """
-    base_name, extension = os.path.splitext(filename)
-    counter = 1
-    new_filename = filename
-
-    while os.path.exists(os.path.join(directory, new_filename)):
-        new_filename = f"{base_name} ({counter}){extension}"
-        counter += 1
-
-    return new_filename
-
-
 def download_bilingual_files_by_language():
     """ 根據選定的語言下載雙語檔案 """
-    if not API_TOKEN:
+    if not core.CLIENT.token:
         messagebox.showerror("Error", "請先登入")
         return
     if not selected_projects_global:
@@ -328,183 +216,60 @@ def download_bilingual_files_by_language():
         return
 
     workflow_name = combo_workflow.get().strip()
+    engine = get_engine()
+
+    projects = list(selected_projects_global)
+    target_langs = list(selected_target_langs)
 
     text_jobs.delete("1.0", tk.END)
-    text_jobs.insert(tk.END, f"開始下載雙語檔案 (模式: {download_mode})...\n\n")
+    text_jobs.insert(tk.END, f"開始下載雙語檔案 (模式: {download_mode}, 引擎: {engine.name})...\n\n")
+    start_background_task(download_bilingual_files_worker, engine, projects, target_langs, save_dir,
+                          download_mode, workflow_name, incremental_var.get(),
+                          core.MERGE_CHUNK_SIZE if chunked_merge_var.get() else None, compress_var.get(),
+                          archive_var.get())
 
-    for project in selected_projects_global:
-        project_name = project['name']
-        project_uid = project['uid']
 
-        text_jobs.insert(tk.END, f"處理專案: {project_name}\n")
+def download_bilingual_files_worker(engine, projects, target_langs, save_dir, download_mode, workflow_name,
+                                    incremental=True, merge_chunk_size=None, compress=False, archive=False):
+    """ 在背景執行緒執行 core.download_bilingual_files_by_language,進度透過 append_text 送回 GUI """
+    core.download_bilingual_files_by_language(engine, projects, target_langs, save_dir, download_mode, workflow_name,
+                                              incremental, log=append_text, cancel_event=cancel_event,
+                                              merge_chunk_size=merge_chunk_size, compress=compress, archive=archive)
+    if not cancel_event.is_set():
+        post_ui(messagebox.showinfo, "完成", "所有雙語檔案下載完成!")
 
-        # 確定 workflow level 和取得 workflow abbreviation
-        workflow_abbr = ""
-        if workflow_name == "No Workflow":
-            workflow_level = None
-        else:
-            if not workflow_name:
-                text_jobs.insert(tk.END, f"Skip: 請輸入工作流程名稱\n")
-                continue
-            workflow_steps = project.get("workflowSteps", [])
-            workflow_info = next((w for w in workflow_steps if w["name"] == workflow_name), None)
-            if workflow_info is None:
-                text_jobs.insert(tk.END, f"Skip: Workflow {workflow_name} not found in project {project_name}\n")
-                continue
-            workflow_level = workflow_info["workflowLevel"]
-            workflow_abbr = workflow_info.get("abbreviation", "")  # 取得縮寫
-
-        try:
-            # 為每個選定的語言下載檔案
-            for target_lang in selected_target_langs:
-                text_jobs.insert(tk.END, f"  處理語言: {target_lang}\n")
-
-                # 取得該語言的 jobs
-                jobs = list_jobs(project_uid, workflowLevel=workflow_level, targetLang=target_lang)
-
-                if not jobs:
-                    text_jobs.insert(tk.END, f"    沒有找到 {target_lang} 的 jobs\n")
-                    continue
-
-                text_jobs.insert(tk.END, f"    找到 {len(jobs)} 個 jobs\n")
-
-                safe_lang = target_lang.replace('/', '_')
-
-                if download_mode == "合併下載":
-                    # 合併下載：一個語言一個檔案
-                    job_uids = [job['uid'] for job in jobs]
-
-                    # 建立語系資料夾 (加上 workflow 縮寫)
-                    if workflow_abbr:
-                        folder_name = f"{safe_lang}_{workflow_abbr}"
-                    else:
-                        folder_name = safe_lang
-                    lang_folder = os.path.join(save_dir, folder_name)
-                    os.makedirs(lang_folder, exist_ok=True)
-
-                    # 建立檔案名稱: 專案名稱_語系_workflow縮寫.mxliff
-                    safe_project_name = "".join(c for c in project_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-                    if workflow_abbr:
-                        filename = f"{safe_project_name}_{safe_lang}_{workflow_abbr}.mxliff"
-                    else:
-                        filename = f"{safe_project_name}_{safe_lang}.mxliff"
-
-                    # 檢查檔名是否重複，如果重複則加上編號
-                    filename = get_unique_filename(lang_folder, filename)
-                    save_path = os.path.join(lang_folder, filename)
-
-                    # 下載合併的雙語檔案
-                    result = download_bilingual_file(project_uid, job_uids, save_path)
-                    text_jobs.insert(tk.END, f"    {result}\n")
-                    logging.info(f"Project {project_name} - Language {target_lang} (merged): {result}")
-
-                else:  # 單獨下載
-                    # 單獨下載：每個 job 一個檔案，使用平行下載加速
-
-                    def download_single_job(job):
-                        """下載單一 job 的函數（用於平行處理）"""
-                        job_uid = job['uid']
-                        job_filename = job.get('filename', 'unknown')
-
-                        # 建立語系資料夾 (加上 workflow 縮寫)
-                        if workflow_abbr:
-                            folder_name = f"{safe_lang}_{workflow_abbr}"
-                        else:
-                            folder_name = safe_lang
-                        lang_folder = os.path.join(save_dir, folder_name)
-                        os.makedirs(lang_folder, exist_ok=True)
-
-                        # 建立檔案名稱: 檔名_語系_workflow縮寫.mxliff
-                        # 移除原始檔案的副檔名
-                        base_filename = os.path.splitext(job_filename)[0]
-                        safe_filename = "".join(
-                            c for c in base_filename if c.isalnum() or c in (' ', '-', '_')).rstrip()
-                        if not safe_filename:  # 如果過濾後檔名是空的
-                            safe_filename = "unnamed"
-
-                        if workflow_abbr:
-                            filename = f"{safe_filename}_{safe_lang}_{workflow_abbr}.mxliff"
-                        else:
-                            filename = f"{safe_filename}_{safe_lang}.mxliff"
-
-                        # 檢查檔名是否重複，如果重複則加上編號
-                        filename = get_unique_filename(lang_folder, filename)
-                        save_path = os.path.join(lang_folder, filename)
-
-                        # 下載單一 job 的雙語檔案
-                        result = download_bilingual_file(project_uid, [job_uid], save_path)
-                        return (job_filename, filename, result)
-
-                    # 使用多執行緒平行下載
-                    max_workers = min(10, len(jobs))  # 最多同時 10 個下載
-                    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                        future_to_job = {executor.submit(download_single_job, job): job for job in jobs}
-                        for future in concurrent.futures.as_completed(future_to_job):
-                            try:
-                                job_filename, final_filename, result = future.result()
-                                text_jobs.insert(tk.END, f"    [{job_filename}] → {final_filename}: {result}\n")
-                                text_jobs.see(tk.END)  # 自動捲動到最新訊息
-                                root.update()  # 更新 GUI 顯示
-                                logging.info(
-                                    f"Project {project_name} - Job {job_filename} - Language {target_lang}: {result}")
-                            except Exception as e:
-                                text_jobs.insert(tk.END, f"    下載失敗: {str(e)}\n")
-                                logging.error(f"Download failed: {str(e)}")
-
-            text_jobs.insert(tk.END, f"專案 {project_name} 完成\n\n")
 
-        except Exception as e:
-            text_jobs.insert(tk.END, f"Error in project {project_name}: {str(e)}\n\n")
-            logging.error(f"Download failed for project {project_name}: {str(e)}")
-
-    text_jobs.insert(tk.END, "所有下載完成!\n")
-    messagebox.showinfo("完成", "所有雙語檔案下載完成!")
-
-
-def update_job_status(project_uid, job_uid, status, retries=3):
-    """ 修改單一 job 的 status,包含重試機制 """
-    global API_TOKEN, HEADERS
-    url = f"{BASE_URL}/api2/v1/projects/{project_uid}/jobs/{job_uid}/setStatus"
-    payload = {
-        "requestedStatus": status,
-        "notifyOwner": True,
-        "propagateStatus": True
-    }
-    session = requests.Session()
-    retries = Retry(total=retries, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+def get_engine():
+    """ 依 GUI 的選擇回傳傳輸引擎;引擎無法使用(帳號池設定有誤等)時顯示錯誤並改用多執行緒引擎 """
     try:
-        response = session.post(url, headers=HEADERS, json=payload)
-        response.raise_for_status()
-        return "Status updated successfully"
-    except requests.exceptions.HTTPError as http_err:
-        if http_err.response.status_code == 401:
-            messagebox.showerror("Error", "Token 已過期,請重新登入")
-            API_TOKEN = None
-            HEADERS = None
-            entry_project.config(state="disabled")
-            combo_workflow.config(state="disabled")
-            combo_status.config(state="disabled")
-            button_search.config(state="disabled")
-            button_show_jobs.config(state="disabled")
-            button_update_status.config(state="disabled")
-            button_download_bilingual.config(state="disabled")
-            label_login_status.config(text="未登入", foreground="red")
-            return "Token expired"
-        return f"HTTP error: {http_err} - Response: {response.text if 'response' in locals() else 'No response'}"
-    except requests.exceptions.RequestException as req_err:
-        return f"Request error: {req_err}"
-
-
-def select_projects(projects):
-    """ 顯示多個專案供使用者選擇(支援多選) """
+        return core.get_engine(engine_var.get())
+    except core.PhraseError as e:
+        messagebox.showerror("Error", str(e))
+        engine_var.set(core.ThreadEngine.name)
+        return core.THREAD_ENGINE
+
+
+def select_projects(projects, search=None, query=""):
+    """ 顯示多個專案供使用者選擇(支援多選),輸入篩選文字時即時過濾清單
+        search(query) 有提供時以其結果(例如離線專案索引)取代 projects 的本機過濾
+    """
+    search = search or (lambda text: core.filter_projects(projects, text))
+    shown = []  # 目前清單中顯示的專案
+
+    def refresh(event=None):
+        shown[:] = search(entry_filter.get())
+        listbox.delete(0, tk.END)
+        listbox.insert(tk.END, *[
+            f"{p['name']} (internalId: {p['internalId']}, Created: {p['dateCreated'][:10]}, Owner: {p['owner']['firstName']} {p['owner']['lastName']})"
+            for p in shown
+        ])
 
     def on_confirm():
         selected_indices = listbox.curselection()
         if not selected_indices:
             messagebox.showerror("Error", "請選擇至少一個專案")
             return
-        selected_projects = [projects[i] for i in selected_indices]
+        selected_projects = [shown[i] for i in selected_indices]
         global selected_projects_global, selected_target_langs
         selected_projects_global = selected_projects
         if len(selected_projects) == 1:
@@ -541,18 +306,20 @@ def select_projects(projects):
 
     tk.Label(project_window, text="找到多個專案,請選擇(可多選):").pack(pady=10)
 
+    # 篩選名稱、客戶、internalId 或負責人,以空白分隔多個關鍵字
+    entry_filter = tk.Entry(project_window, width=50)
+    entry_filter.insert(0, query)
+    entry_filter.pack()
+    entry_filter.bind('<KeyRelease>', refresh)
+    entry_filter.focus_set()
+
     scrollbar = tk.Scrollbar(project_window)
     scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
     listbox = tk.Listbox(project_window, selectmode=tk.EXTENDED, yscrollcommand=scrollbar.set, height=15, width=80)
-    project_options = [
-        f"{p['name']} (internalId: {p['internalId']}, Created: {p['dateCreated'][:10]}, Owner: {p['owner']['firstName']} {p['owner']['lastName']})"
-        for p in projects
-    ]
-    for opt in project_options:
-        listbox.insert(tk.END, opt)
     listbox.pack(pady=10)
     scrollbar.config(command=listbox.yview)
+    refresh()
 
     button_frame = tk.Frame(project_window)
     button_frame.pack(pady=10)
@@ -562,7 +329,7 @@ def select_projects(projects):
 
 def search_project():
     """ 查詢專案,可同時使用專案名稱(多行)與客戶名稱條件 """
-    if not API_TOKEN:
+    if not core.CLIENT.token:
         messagebox.showerror("Error", "請先登入")
         return
 
@@ -578,33 +345,13 @@ def search_project():
         return
 
     try:
-        projects_all = []
-        seen_uids = set()
-
-        # 若有專案名稱,逐一查詢
-        if project_names:
-            for project_name in project_names:
-                projects = list_projects(project_name=project_name, client_name=client_name or None)
-                for p in projects:
-                    if p['uid'] not in seen_uids:
-                        seen_uids.add(p['uid'])
-                        projects_all.append(p)
-        else:
-            # 若沒有專案名稱,但有客戶名稱
-            projects = list_projects(client_name=client_name)
-            for p in projects:
-                if p['uid'] not in seen_uids:
-                    seen_uids.add(p['uid'])
-                    projects_all.append(p)
+        projects_all = core.search_projects(get_engine(), project_names, client_name or None)
 
         # 無結果
         if not projects_all:
             messagebox.showerror("Error", "未找到符合條件的專案")
             return
 
-        # 依建立日期降冪排序
-        projects_all.sort(key=lambda x: x['dateCreated'], reverse=True)
-
         # 多專案 → 顯示選擇視窗
         if len(projects_all) > 1:
             select_projects(projects_all)
@@ -633,9 +380,29 @@ def search_project():
         logging.error(f"Search project failed: {str(e)}")
 
 
+def browse_project_index():
+    """ 從離線專案索引選擇專案:已登入時先在背景增量同步,未登入時直接搜尋本機索引 """
+    project_names_text = entry_project.get("1.0", tk.END).strip()
+    query = " ".join(filter(None, [project_names_text.split('\n')[0].strip(), entry_client.get().strip()]))
+    if not core.CLIENT.token:
+        if not core.PROJECT_INDEX.projects():
+            messagebox.showerror("Error", "專案索引是空的,請先登入以同步")
+            return
+        select_projects([], core.PROJECT_INDEX.search, query)
+        return
+    text_jobs.delete("1.0", tk.END)
+    start_background_task(sync_project_index_worker, get_engine(), query)
+
+
+def sync_project_index_worker(engine, query):
+    """ 在背景執行緒同步專案索引,完成後在主執行緒開啟選擇視窗 """
+    core.sync_project_index(engine, log=append_text)
+    post_ui(select_projects, [], core.PROJECT_INDEX.search, query)
+
+
 def show_jobs():
     """ 顯示指定工作流程的任務列表 """
-    if not API_TOKEN:
+    if not core.CLIENT.token:
         messagebox.showerror("Error", "請先登入")
         return
     if len(selected_projects_global) > 1:
@@ -646,7 +413,7 @@ def show_jobs():
     project = selected_projects_global[0]
 
     # 檢查是否選擇「No Workflow」
-    if workflow_name == "No Workflow":
+    if workflow_name == core.NO_WORKFLOW:
         workflow_level = None
     else:
         workflow_steps = project.get("workflowSteps", [])
@@ -656,7 +423,7 @@ def show_jobs():
             return
 
     try:
-        jobs = list_jobs(project['uid'], workflowLevel=workflow_level)
+        jobs = get_engine().list_jobs(project['uid'], workflowLevel=workflow_level)
         if not jobs:
             text_jobs.delete("1.0", tk.END)
             text_jobs.insert(tk.END, f"No jobs found")
@@ -671,7 +438,7 @@ def show_jobs():
 
 def update_all_jobs_status():
     """ 批量更新指定工作流程層級的任務狀態 """
-    if not API_TOKEN:
+    if not core.CLIENT.token:
         messagebox.showerror("Error", "請先登入")
         return
     if not selected_projects_global:
@@ -685,92 +452,59 @@ def update_all_jobs_status():
         messagebox.showerror("Error", "請選擇狀態")
         return
 
+    engine = get_engine()
+    projects = list(selected_projects_global)
+    resume = True
+    completed = core.StatusJournal(projects, workflow_name, new_status).completed
+    if completed:
+        # 先前相同設定的更新曾中斷:繼續(記錄中的 jobs 計入先前已完成)或捨棄記錄,統計從零開始
+        # 兩種情況都依最新的 job 狀態判斷,已是目標狀態的 jobs 不會再送出
+        answer = messagebox.askyesnocancel(
+            "繼續更新", f"先前相同設定的狀態更新({new_status})中斷時已完成 {len(completed)} 個 jobs。\n"
+                        "是:從中斷處繼續統計  否:捨棄記錄,統計從零開始\n"
+                        "(已是目標狀態的 jobs 兩種情況都不會再送出)")
+        if answer is None:
+            return
+        resume = answer
     text_jobs.delete("1.0", tk.END)
+    start_background_task(update_all_jobs_status_worker, engine, projects, workflow_name, new_status, resume)
 
-    for project in selected_projects_global:
-        text_jobs.insert(tk.END, f"Processing project: {project['name']}\n")
 
-        # 檢查是否選擇「No Workflow」
-        if workflow_name == "No Workflow":
-            workflow_level = None
-        else:
-            if not workflow_name:
-                text_jobs.insert(tk.END, f"Skip: 請輸入工作流程名稱\n")
-                continue
-            workflow_steps = project.get("workflowSteps", [])
-            workflow_level = next((w["workflowLevel"] for w in workflow_steps if w["name"] == workflow_name), None)
-            if workflow_level is None:
-                text_jobs.insert(tk.END, f"Skip: Workflow {workflow_name} not found in project {project['name']}\n")
-                continue
+def update_all_jobs_status_worker(engine, projects, workflow_name, new_status, resume=True):
+    """ 在背景執行緒批量更新狀態;token 過期時保留參數,重新登入後詢問是否繼續 """
+    global interrupted_update
+    totals = core.update_all_jobs_status(engine, projects, workflow_name, new_status, append_text, cancel_event,
+                                         resume=resume)
+    interrupted_update = (engine, projects, workflow_name, new_status) if totals["token_expired"] else None
 
-        try:
-            start_time = time.time()
-            jobs = list_jobs(project['uid'], workflowLevel=workflow_level)
-
-            if not jobs:
-                text_jobs.insert(tk.END, f"No jobs found in project {project['name']}\n")
-                continue
-
-            success_count = 0
-            fail_count = 0
-            batch_size = 50
-
-            def update_single_job(job):
-                job_uid = job["uid"]
-                job_filename = job.get("filename", "N/A")
-                job_workflow_level = job.get("workflowLevel")
-
-                # 如果指定了 workflow level,檢查是否匹配
-                if workflow_level is not None and job_workflow_level != workflow_level:
-                    return (job_uid, job_filename, f"跳過: 屬於工作流程層級 {job_workflow_level}")
-
-                try:
-                    result = update_job_status(project['uid'], job_uid, new_status)
-                    return (job_uid, job_filename,
-                            result if result == "Status updated successfully" else f"更新失敗: {result}")
-                except Exception as e:
-                    return (job_uid, job_filename, f"更新失敗: {str(e)}")
-
-            for i in range(0, len(jobs), batch_size):
-                batch = jobs[i:i + batch_size]
-                max_workers = min(50, len(batch))
-                with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    future_to_job = {executor.submit(update_single_job, job): job for job in batch}
-                    for future in concurrent.futures.as_completed(future_to_job):
-                        job_uid, job_filename, result = future.result()
-                        text_jobs.insert(tk.END, f"{project['name']} - {job_filename} ({job_uid}) → {result}\n")
-                        if result == "Status updated successfully":
-                            success_count += 1
-                        elif not result.startswith("跳過"):
-                            fail_count += 1
-                        logging.info(f"Project {project['name']} Job {job_uid} ({job_filename}): {result}")
-
-            elapsed_time = time.time() - start_time
-            text_jobs.insert(tk.END,
-                             f"Project {project['name']}: 成功更新 {success_count} 個 jobs,失敗 {fail_count} 個,耗時 {elapsed_time:.2f} 秒\n\n")
-            logging.info(
-                f"Project {project['name']}: Batch update completed: {success_count} successful, {fail_count} failed, took {elapsed_time:.2f} seconds")
 
-        except Exception as e:
-            text_jobs.insert(tk.END, f"Error in project {project['name']}: {str(e)}\n")
-            logging.error(f"Batch update failed for project {project['name']}: {str(e)}")
+def resume_interrupted_update():
+    """ 重新登入後,從記錄繼續先前因 token 過期而中斷的狀態更新(只送出尚未完成的 jobs) """
+    if interrupted_update is None:
+        return
+    new_status = interrupted_update[3]
+    if messagebox.askyesno("繼續更新", f"先前的狀態更新({new_status})因 token 過期而中斷,是否從中斷處繼續?"):
+        start_background_task(update_all_jobs_status_worker, *interrupted_update)
+
+
+def clear_listing_cache():
+    """ 清除專案與 job 清單的本機快取與離線專案索引,下次查詢改為即時查詢 API """
+    core.LISTING_CACHE.clear()
+    core.PROJECT_INDEX.clear()
+    label_project_uid.config(text="快取已清除")
+    logging.info("Listing cache cleared")
 
 
 def clear_credentials():
     """ 清除儲存的憑證 """
     try:
-        if os.path.exists(CREDENTIALS_FILE):
-            os.remove(CREDENTIALS_FILE)
-        key_file = os.path.join(BASE_DIR, "key.key")
-        if os.path.exists(key_file):
-            os.remove(key_file)
-        entry_username.delete(0, tk.END)
-        entry_password.delete(0, tk.END)
-        label_login_status.config(text="憑證已清除", foreground="blue")
-        logging.info("Credentials cleared")
-    except Exception as e:
-        logging.error(f"Failed to clear credentials: {type(e).__name__} - {str(e)}")
-        messagebox.showerror("Error", f"無法清除憑證: {str(e)}")
+        core.clear_credentials()
+    except core.PhraseError as e:
+        messagebox.showerror("Error", str(e))
+        return
+    entry_username.delete(0, tk.END)
+    entry_password.delete(0, tk.END)
+    label_login_status.config(text="憑證已清除", foreground="blue")
 
 
 # GUI 初始化
@@ -803,6 +537,10 @@ entry_client = tk.Entry(frame_project, width=30, state="normal")
 entry_client.grid(row=1, column=1, padx=5)
 button_search = tk.Button(frame_project, text="查詢專案", command=search_project, state="disabled")
 button_search.grid(row=0, column=2, padx=5, sticky="n")
+button_clear_cache = tk.Button(frame_project, text="清除快取", command=clear_listing_cache)
+button_clear_cache.grid(row=1, column=2, padx=5)
+button_browse_index = tk.Button(frame_project, text="離線搜尋", command=browse_project_index)
+button_browse_index.grid(row=0, column=2, padx=5, sticky="s")
 label_project_uid = tk.Label(frame_project, text="Project UID: 未選擇")
 label_project_uid.grid(row=2, column=0, columnspan=3, pady=5)
 
@@ -812,7 +550,7 @@ tk.Label(frame_workflow, text="工作流程名稱:").grid(row=0, column=0, padx=
 
 # 在預設選項中加入 "No Workflow"
 all_values = [
-    "No Workflow",
+    core.NO_WORKFLOW,
     "Translation", "Revision", "Client review", "Revision2",
     "Client Review2", "MT_pre", "Trans_pre", "Feedback",
     "MTPE", "Feedback2", "Client Review3"
@@ -833,9 +571,7 @@ combo_workflow = ttk.Combobox(frame_workflow, values=all_values, state="normal")
 combo_workflow.grid(row=0, column=1, padx=5)
 combo_workflow.bind('<KeyRelease>', on_keyrelease)
 tk.Label(frame_workflow, text="狀態:").grid(row=0, column=2, padx=5)
-combo_status = ttk.Combobox(frame_workflow,
-                            values=["NEW", "ACCEPTED", "DECLINED", "REJECTED", "DELIVERED", "EMAILED", "COMPLETED",
-                                    "CANCELLED"], state="disabled")
+combo_status = ttk.Combobox(frame_workflow, values=core.JOB_STATUSES, state="disabled")
 combo_status.grid(row=0, column=3, padx=5)
 
 # 新增語言選擇區域
@@ -850,13 +586,41 @@ label_selected_langs.grid(row=0, column=1, padx=5)
 frame_download_mode = tk.Frame(root)
 frame_download_mode.pack(pady=5)
 tk.Label(frame_download_mode, text="下載模式:").grid(row=0, column=0, padx=5)
-download_mode_var = tk.StringVar(value="合併下載")
+download_mode_var = tk.StringVar(value=core.MODE_MERGED)
 radio_merge = tk.Radiobutton(frame_download_mode, text="合併下載 (專案名稱_語系)", variable=download_mode_var,
-                             value="合併下載")
+                             value=core.MODE_MERGED)
 radio_merge.grid(row=0, column=1, padx=5)
 radio_separate = tk.Radiobutton(frame_download_mode, text="單獨下載 (檔名_語系)", variable=download_mode_var,
-                                value="單獨下載")
+                                value=core.MODE_SEPARATE)
 radio_separate.grid(row=0, column=2, padx=5)
+incremental_var = tk.BooleanVar(value=True)
+check_incremental = tk.Checkbutton(frame_download_mode, text="只下載新增或變更的 jobs", variable=incremental_var)
+check_incremental.grid(row=1, column=1, columnspan=2, padx=5)
+chunked_merge_var = tk.BooleanVar(value=False)
+check_chunked_merge = tk.Checkbutton(frame_download_mode, variable=chunked_merge_var,
+                                     text=f"合併下載分段平行下載 (每 {core.MERGE_CHUNK_SIZE} 個 jobs,本機合併)")
+check_chunked_merge.grid(row=2, column=1, columnspan=2, padx=5)
+compress_var = tk.BooleanVar(value=False)
+check_compress = tk.Checkbutton(frame_download_mode, text="壓縮儲存 (.mxliff.gz)", variable=compress_var)
+check_compress.grid(row=3, column=1, columnspan=2, padx=5)
+archive_var = tk.BooleanVar(value=False)
+check_archive = tk.Checkbutton(frame_download_mode, text="全部寫入單一 ZIP 檔", variable=archive_var)
+check_archive.grid(row=4, column=1, columnspan=2, padx=5)
+
+# 傳輸引擎選擇區域(asyncio 引擎需要安裝 httpx)
+frame_engine = tk.Frame(root)
+frame_engine.pack(pady=5)
+tk.Label(frame_engine, text="傳輸引擎:").grid(row=0, column=0, padx=5)
+engine_var = tk.StringVar(value=core.ThreadEngine.name)
+radio_threads = tk.Radiobutton(frame_engine, text="多執行緒", variable=engine_var, value=core.ThreadEngine.name)
+radio_threads.grid(row=0, column=1, padx=5)
+radio_asyncio = tk.Radiobutton(frame_engine, text="asyncio (httpx)", variable=engine_var, value=core.AsyncEngine.name,
+                               state="normal" if core.httpx is not None else "disabled")
+radio_asyncio.grid(row=0, column=2, padx=5)
+# 帳號池:下載與狀態更新分散到 accounts.json 設定的多個服務帳號
+radio_pool = tk.Radiobutton(frame_engine, text="帳號池", variable=engine_var, value=core.PoolEngine.name,
+                            state="normal" if os.path.exists(core.ACCOUNTS_FILE) else "disabled")
+radio_pool.grid(row=0, column=3, padx=5)
 
 frame_buttons = tk.Frame(root)
 frame_buttons.pack(pady=10)
@@ -868,6 +632,8 @@ button_update_status.grid(row=0, column=1, padx=5)
 button_download_bilingual = tk.Button(frame_buttons, text="下載雙語檔案", command=download_bilingual_files_by_language,
                                       state="disabled")
 button_download_bilingual.grid(row=0, column=2, padx=5)
+button_cancel = tk.Button(frame_buttons, text="取消", command=cancel_task, state="disabled")
+button_cancel.grid(row=0, column=3, padx=5)
 
 frame_jobs = tk.Frame(root)
 frame_jobs.pack(pady=10, fill=tk.BOTH, expand=True)
@@ -876,29 +642,17 @@ text_jobs.pack()
 
 
 def initialize_app():
-    credentials = load_credentials()
+    credentials = core.restore_session()
     if credentials:
         entry_username.insert(0, credentials["username"])
-        if credentials.get("token") and is_token_valid(credentials.get("expires")):
-            global API_TOKEN, HEADERS
-            API_TOKEN = credentials["token"]
-            HEADERS = {
-                "Authorization": f"ApiToken {API_TOKEN}",
-                "Content-Type": "application/json"
-            }
-            entry_project.config(state="normal")
-            combo_workflow.config(state="normal")
-            combo_status.config(state="normal")
-            button_search.config(state="normal")
-            button_show_jobs.config(state="normal")
-            button_update_status.config(state="normal")
-            button_download_bilingual.config(state="normal")
-            label_login_status.config(text="已使用儲存的 Token", foreground="green")
-            logging.info(f"Using stored token for user: {credentials['username']}")
+        if core.CLIENT.token:
+            enable_logged_in("已使用儲存的 Token")
         else:
             label_login_status.config(text="Token 無效或已過期,請登入", foreground="red")
             logging.info("Stored token invalid or expired, waiting for user login")
 
 
+core.token_expired_listeners.append(lambda: post_ui(show_logged_out))
 root.after(0, initialize_app)
-root.mainloop()
\ No newline at end of file
+root.after(UI_POLL_INTERVAL_MS, poll_ui_queue)
+root.mainloop()
@@ -0,0 +1,339 @@
+""" 本機模擬的 Phrase TMS API,供開發測試與效能基準使用(只依賴標準函式庫)
+
+    支援本工具使用的端點:auth/login、projects、projects/{uid}/jobs(分頁)、
+    projects/{uid}/jobs/bilingualFile、projects/{uid}/jobs/{uid}/setStatus
+    可設定延遲、每頁上限、每個 job 的 MXLIFF 大小、token 有效時間與 429/5xx 注入比例
+
+    python mock_phrase_server.py --port 8080 --jobs 1000 --latency 0.02 --error-rate-429 0.01
+    PHRASE_BASE_URL=http://127.0.0.1:8080/web python phrase_cli.py login --username mock
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = "/api2/v1"
+WORKFLOW_STEPS = [("Translation", "T"), ("Revision", "R"), ("Client review", "CR")]
+MXLIFF_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<xliff xmlns="urn:oasis:names:tc:xliff:document:1.2" '
+                 'xmlns:m="http://www.memsource.com/mxlf/2.0" version="1.2" m:version="2.0">\n')
+MXLIFF_FOOTER = '</xliff>\n'
+
+JOBS_PATH = re.compile(rf"^{API_PREFIX}/projects/([^/]+)/jobs$")
+BILINGUAL_PATH = re.compile(rf"^{API_PREFIX}/projects/([^/]+)/jobs/bilingualFile$")
+SET_STATUS_PATH = re.compile(rf"^{API_PREFIX}/projects/([^/]+)/jobs/([^/]+)/setStatus$")
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """ 用戶端關閉 keep-alive 連線時不輸出 traceback """
+    daemon_threads = True
+    request_queue_size = 1024  # 預設的 listen backlog(5)在數百個連線同時建立時會丟棄 SYN,造成秒級的重送延遲
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockPhraseServer:
+    """ 在背景執行緒執行的模擬伺服器;資料在建立時產生,setStatus 會更新記憶體中的 job 狀態
+
+        projects / jobs_per_project / target_langs:產生的資料量(每個專案、每個語言、每個工作流程層級各 jobs_per_project 個)
+        latency / latency_per_job:每個請求的基本延遲與 bilingualFile 每個 job 額外的延遲(秒)
+        max_page_size:伺服器允許的 pageSize 上限;job_payload_size:每個 job 在 MXLIFF 中的大約位元組數
+        error_rate_429 / error_rate_5xx:回傳 429(附 Retry-After)或 503 的機率;token_ttl:登入 token 的有效秒數
+        user_rps:每個使用者每秒允許的請求數(與 Phrase 相同以使用者為單位),超過時回傳 429;0 表示不限制
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, projects=1, jobs_per_project=100, target_langs=("de",),
+                 latency=0.0, latency_per_job=0.0, max_page_size=50, job_payload_size=2048,
+                 error_rate_429=0.0, error_rate_5xx=0.0, retry_after=1, token_ttl=3600, user_rps=0, seed=0):
+        self.latency = latency
+        self.latency_per_job = latency_per_job
+        self.max_page_size = max_page_size
+        self.job_payload_size = job_payload_size
+        self.error_rate_429 = error_rate_429
+        self.error_rate_5xx = error_rate_5xx
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.user_rps = user_rps
+        self.tokens = {}  # token → (到期時間(time.time()), 使用者名稱)
+        self.user_windows = {}  # 使用者名稱 → [目前的一秒區間, 區間內的請求數]
+        self.request_counts = {}  # 端點 → 請求數
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.projects, self.jobs = self._generate(projects, jobs_per_project, list(target_langs))
+        self.jobs_by_uid = {job["uid"]: job for jobs in self.jobs.values() for job in jobs}
+        self.httpd = QuietHTTPServer((host, port), self._handler_class())
+        self.thread = None
+
+    @property
+    def url(self):
+        """ 對應 BASE_URL 的網址(含 /web) """
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/web"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-phrase", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @staticmethod
+    def _generate(project_count, jobs_per_project, target_langs):
+        projects, jobs = [], {}
+        # 最後一個專案的建立時間為現在,每個專案間隔一小時
+        created = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=project_count - 1)
+        for p in range(project_count):
+            uid = f"proj{p:05d}"
+            projects.append({
+                "uid": uid,
+                "name": f"Mock Project {p:05d}",
+                "internalId": p + 1,
+                "dateCreated": (created + timedelta(hours=p)).isoformat().replace("+00:00", "Z"),
+                "owner": {"firstName": "Mock", "lastName": f"Owner{p % 7}"},
+                "client": {"name": f"Client {p % 5}"},
+                "targetLangs": target_langs,
+                "workflowSteps": [{"name": name, "abbreviation": abbr, "workflowLevel": level}
+                                  for level, (name, abbr) in enumerate(WORKFLOW_STEPS, 1)],
+            })
+            jobs[uid] = [{
+                "uid": f"{uid}-{lang}-{level}-{j:06d}",
+                "filename": f"file{j:06d}.docx",
+                "targetLang": lang,
+                "workflowLevel": level,
+                "status": "NEW",
+                "dateDue": None,
+            } for lang in target_langs for level in range(1, len(WORKFLOW_STEPS) + 1)
+                for j in range(jobs_per_project)]
+        return projects, jobs
+
+    def _over_user_limit(self, username):
+        """ 以每秒固定區間計算使用者的請求數,超過 user_rps 時回傳 True """
+        if not self.user_rps:
+            return False
+        second = int(time.time())
+        with self.lock:
+            window = self.user_windows.setdefault(username, [second, 0])
+            if window[0] != second:
+                window[:] = [second, 0]
+            window[1] += 1
+            return window[1] > self.user_rps
+
+    def _inject_error(self):
+        """ 依設定的比例回傳 (狀態碼, 標頭),不注入時回傳 None """
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.error_rate_429:
+            return 429, {"Retry-After": str(self.retry_after)}
+        if roll < self.error_rate_429 + self.error_rate_5xx:
+            return 503, {}
+        return None
+
+    def _page(self, items, query):
+        page_size = min(int(query.get("pageSize", ["50"])[0]), self.max_page_size)
+        page_number = int(query.get("pageNumber", ["0"])[0])
+        content = items[page_number * page_size:(page_number + 1) * page_size]
+        return {
+            "totalElements": len(items),
+            "totalPages": (len(items) + page_size - 1) // page_size,
+            "pageSize": page_size,
+            "pageNumber": page_number,
+            "numberOfElements": len(content),
+            "content": content,
+        }
+
+    def _mxliff(self, jobs):
+        padding = "x" * max(self.job_payload_size - 300, 0)
+        yield MXLIFF_HEADER.encode("utf-8")
+        for job in jobs:
+            yield (f'<file original="{job["filename"]}" source-language="en" target-language="{job["targetLang"]}" '
+                   f'datatype="x-undefined" m:job-uid="{job["uid"]}" m:level="{job["workflowLevel"]}">'
+                   f'<body><trans-unit id="1"><source>Mock source {padding}</source>'
+                   f'<target>Mock target</target></trans-unit></body></file>\n').encode("utf-8")
+        yield MXLIFF_FOOTER.encode("utf-8")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # 標頭與內容分開寫出,避免與用戶端的 delayed ACK 疊加出 40 ms 延遲
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=b"", headers=None, content_type="application/json"):
+                encoding = None
+                accept = self.headers.get("Accept-Encoding", "")
+                if len(body) >= 1024 and "gzip" in accept:
+                    body, encoding = gzip.compress(body, compresslevel=1), "gzip"
+                elif len(body) >= 1024 and "deflate" in accept:
+                    body, encoding = zlib.compress(body, 1), "deflate"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if encoding:
+                    self.send_header("Content-Encoding", encoding)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, status, data):
+                self._send(status, json.dumps(data).encode("utf-8"))
+
+            def _read_json(self):
+                length = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _authorized(self):
+                token = self.headers.get("Authorization", "").replace("ApiToken ", "", 1)
+                with server.lock:
+                    expires, username = server.tokens.get(token, (0, None))
+                return username if expires > time.time() else None
+
+            def _dispatch(self, method):
+                path = urlparse(self.path).path
+                if path.startswith("/web/"):
+                    path = path[len("/web"):]
+                body = self._read_json() if method == "POST" else {}
+                endpoint = path.rsplit("/", 1)[-1]
+                with server.lock:
+                    server.request_counts[endpoint] = server.request_counts.get(endpoint, 0) + 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if path == f"{API_PREFIX}/auth/login" and method == "POST":
+                    return self._login(body)
+                username = self._authorized()
+                if username is None:
+                    return self._json(401, {"errorCode": "AuthUnauthorized"})
+                if server._over_user_limit(username):
+                    return self._send(429, json.dumps({"errorCode": "TooManyRequests"}).encode("utf-8"),
+                                      {"Retry-After": str(server.retry_after)})
+                injected = server._inject_error()
+                if injected:
+                    status, headers = injected
+                    return self._send(status, json.dumps({"errorCode": "Mock"}).encode("utf-8"), headers)
+                query = parse_qs(urlparse(self.path).query)
+                if path == f"{API_PREFIX}/projects" and method == "GET":
+                    return self._projects(query)
+                match = JOBS_PATH.match(path)
+                if match and method == "GET":
+                    return self._jobs(match.group(1), query)
+                match = BILINGUAL_PATH.match(path)
+                if match and method == "POST":
+                    return self._bilingual(match.group(1), body)
+                match = SET_STATUS_PATH.match(path)
+                if match and method == "POST":
+                    return self._set_status(match.group(1), match.group(2), body)
+                self._json(404, {"errorCode": "NotFound"})
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def _login(self, body):
+                if not body.get("userName") or not body.get("password"):
+                    return self._json(401, {"errorCode": "AuthInvalidCredentials"})
+                token = uuid.uuid4().hex
+                expires = time.time() + server.token_ttl
+                with server.lock:
+                    server.tokens[token] = (expires, body["userName"])
+                self._json(200, {
+                    "token": token,
+                    "expires": datetime.fromtimestamp(expires, timezone.utc).isoformat().replace("+00:00", "Z"),
+                    "user": {"userName": body["userName"]},
+                })
+
+            def _projects(self, query):
+                projects = server.projects
+                name = query.get("name", [""])[0].lower()
+                client_name = query.get("clientName", [""])[0].lower()
+                if name:
+                    projects = [p for p in projects if name in p["name"].lower()]
+                if client_name:
+                    projects = [p for p in projects if client_name in p["client"]["name"].lower()]
+                created_hours = query.get("createdInLastHours", [""])[0]
+                if created_hours:
+                    since = (datetime.now(timezone.utc) - timedelta(hours=int(created_hours))).isoformat()
+                    projects = [p for p in projects if p["dateCreated"].replace("Z", "+00:00") >= since]
+                self._json(200, server._page(projects, query))
+
+            def _jobs(self, project_uid, query):
+                if project_uid not in server.jobs:
+                    return self._json(404, {"errorCode": "ProjectNotFound"})
+                level = int(query.get("workflowLevel", ["1"])[0])
+                jobs = [j for j in server.jobs[project_uid] if j["workflowLevel"] == level]
+                target_lang = query.get("targetLang", [""])[0]
+                if target_lang:
+                    jobs = [j for j in jobs if j["targetLang"] == target_lang]
+                self._json(200, server._page(jobs, query))
+
+            def _bilingual(self, project_uid, body):
+                jobs = [server.jobs_by_uid.get(item.get("uid")) for item in body.get("jobs", [])]
+                if not jobs or None in jobs:
+                    return self._json(400, {"errorCode": "JobNotFound"})
+                if server.latency_per_job:
+                    time.sleep(server.latency_per_job * len(jobs))
+                self._send(200, b"".join(server._mxliff(jobs)), content_type="application/octet-stream")
+
+            def _set_status(self, project_uid, job_uid, body):
+                with server.lock:
+                    job = server.jobs_by_uid.get(job_uid)
+                    if job is not None:
+                        job["status"] = body.get("requestedStatus", job["status"])
+                if job is None:
+                    return self._json(404, {"errorCode": "JobNotFound"})
+                self._send(204)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模擬的 Phrase TMS API 伺服器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--projects", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=100, help="每個專案、語言、工作流程層級的 job 數")
+    parser.add_argument("--langs", default="de,fr,ja", help="目標語言,以逗號分隔")
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求的延遲(秒)")
+    parser.add_argument("--latency-per-job", type=float, default=0.0, help="bilingualFile 每個 job 額外的延遲(秒)")
+    parser.add_argument("--max-page-size", type=int, default=50)
+    parser.add_argument("--payload-size", type=int, default=2048, help="每個 job 在 MXLIFF 中的大約位元組數")
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--token-ttl", type=int, default=3600, help="token 有效秒數")
+    parser.add_argument("--user-rps", type=int, default=0, help="每個使用者每秒的請求上限(0 表示不限制)")
+    args = parser.parse_args(argv)
+    server = MockPhraseServer(
+        args.host, args.port, projects=args.projects, jobs_per_project=args.jobs,
+        target_langs=args.langs.split(","), latency=args.latency, latency_per_job=args.latency_per_job,
+        max_page_size=args.max_page_size, job_payload_size=args.payload_size, error_rate_429=args.error_rate_429,
+        error_rate_5xx=args.error_rate_5xx, retry_after=args.retry_after, token_ttl=args.token_ttl,
+        user_rps=args.user_rps)
+    print(f"Mock Phrase TMS API: {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+""" 以模擬伺服器(mock_phrase_server.py)測量 job 清單、下載與批量更新的吞吐量
+
+    python phrase_benchmark.py                                   (100、1000、10000 個 jobs,執行緒引擎)
+    python phrase_benchmark.py --sizes 1000 --engine asyncio --latency 0.05 --error-rate-429 0.01
+    python phrase_benchmark.py --url http://127.0.0.1:8080/web --sizes 300   (使用已啟動的伺服器,jobs 數需與伺服器一致)
+    python phrase_benchmark.py --sizes 1000 --user-rps 20 --accounts 3   (帳號池,3 個服務帳號)
+
+    限流器使用與正式執行相同的設定(rate_limits.json 與自適應速率),--user-rps 模擬伺服器端的速率限制
+    日誌、清單快取、專案索引、狀態更新記錄與效能報告都寫入暫存目錄(登入不寫入 credentials.json),
+    不會在程式目錄留下檔案
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import phrase_core as core
+from mock_phrase_server import MockPhraseServer
+
+DEFAULT_SIZES = [100, 1000, 10000]
+BENCHMARK_LANG = "de"
+
+
+def login_mock(username="benchmark", password="benchmark"):
+    """ 登入但不寫入 credentials.json """
+    response = core.CLIENT.post("/api2/v1/auth/login", json={"userName": username, "password": password})
+    response.raise_for_status()
+    core.activate_token(username, response.json()["token"])
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def endpoint_latency(endpoint):
+    """ 本次統計區間中指定端點的 p50 / p99 延遲(毫秒)與重試次數 """
+    data = core.METRICS.summary()["endpoints"].get(endpoint)
+    if not data:
+        return {}
+    return {"p50_ms": data["latency_seconds"]["p50"] * 1000, "p99_ms": data["latency_seconds"]["p99"] * 1000,
+            "retries": data["retries"], "throttled": data["throttled"]}
+
+
+def bench_listing(engine, project):
+    core.METRICS.begin_run("benchmark_listing")
+    start = time.perf_counter()
+    jobs = engine.fetch_jobs(project["uid"], workflowLevel=1)
+    elapsed = time.perf_counter() - start
+    return {"items": len(jobs), "seconds": elapsed, "per_second": len(jobs) / elapsed, **endpoint_latency("jobs")}
+
+
+def bench_download(engine, project, work_dir):
+    """ 每個 job 單獨下載(包含列出 jobs 的時間);first_seconds 為第一個檔案下載完成的時間 """
+    save_dir = tempfile.mkdtemp(prefix="download_", dir=work_dir)
+    first = []
+
+    def log(text):
+        if not first and "成功下載到" in text:
+            first.append(time.perf_counter())
+
+    start = time.perf_counter()
+    summary = core.download_bilingual_files_by_language(engine, [project], [BENCHMARK_LANG], save_dir,
+                                                        core.MODE_SEPARATE, incremental=False, log=log)
+    elapsed = time.perf_counter() - start
+    num_bytes = directory_size(save_dir)
+    shutil.rmtree(save_dir, ignore_errors=True)
+    return {"items": summary["downloaded"], "failed": summary["failed"], "seconds": elapsed,
+            "per_second": summary["downloaded"] / elapsed, "mb_per_second": num_bytes / elapsed / 1024 / 1024,
+            "first_seconds": first[0] - start if first else None,
+            **endpoint_latency("bilingualFile")}
+
+
+def bench_update(engine, project, status):
+    """ 批量更新狀態(包含列出 jobs 的時間) """
+    start = time.perf_counter()
+    totals = core.update_all_jobs_status(engine, [project], core.NO_WORKFLOW, status)
+    elapsed = time.perf_counter() - start
+    return {"items": totals["success"], "failed": totals["failed"], "seconds": elapsed,
+            "per_second": totals["success"] / elapsed, **endpoint_latency("setStatus")}
+
+
+def make_engine(args):
+    if args.accounts:
+        pool = core.TokenPool([(f"svc{i}", "benchmark") for i in range(args.accounts)])
+        for client in pool.clients:
+            client.base_url = core.CLIENT.base_url
+        return core.PoolEngine(pool)
+    # asyncio 引擎的 httpx client 綁定 base_url,每個伺服器各建一個
+    return core.AsyncEngine(core.CLIENT) if args.engine == core.AsyncEngine.name else core.THREAD_ENGINE
+
+
+def run_size(args, size, work_dir):
+    server = None
+    if args.url:
+        base_url = args.url
+    else:
+        server = MockPhraseServer(
+            projects=1, jobs_per_project=size, target_langs=[BENCHMARK_LANG], latency=args.latency,
+            latency_per_job=args.latency_per_job, max_page_size=core.MAX_PAGE_SIZE,
+            job_payload_size=args.payload_size, error_rate_429=args.error_rate_429,
+            error_rate_5xx=args.error_rate_5xx, retry_after=args.retry_after, user_rps=args.user_rps).start()
+        base_url = server.url
+    core.CLIENT.base_url = base_url
+    engine = make_engine(args)
+    try:
+        login_mock()
+        project = core.list_projects()[0]
+        results = {"jobs": size}
+        if "list" in args.scenarios:
+            results["list"] = bench_listing(engine, project)
+        if "download" in args.scenarios:
+            results["download"] = bench_download(engine, project, work_dir)
+        if "update" in args.scenarios:
+            results["update"] = bench_update(engine, project, args.status)
+        return results
+    finally:
+        if server is not None:
+            server.stop()
+
+
+def print_results(all_results):
+    sys.stdout.write(f"{'jobs':>7} {'scenario':<9} {'items':>7} {'failed':>6} {'seconds':>8} {'first s':>8} "
+                     f"{'items/s':>9} {'MB/s':>7} {'p50 ms':>7} {'p99 ms':>7} {'retries':>7}\n")
+    for results in all_results:
+        for scenario in ("list", "download", "update"):
+            row = results.get(scenario)
+            if row is None:
+                continue
+            mb = f"{row['mb_per_second']:.2f}" if "mb_per_second" in row else "-"
+            first = f"{row['first_seconds']:.2f}" if row.get("first_seconds") is not None else "-"
+            sys.stdout.write(
+                f"{results['jobs']:>7} {scenario:<9} {row['items']:>7} {row.get('failed', 0):>6} "
+                f"{row['seconds']:>8.2f} {first:>8} {row['per_second']:>9.1f} {mb:>7} {row.get('p50_ms', 0):>7.1f} "
+                f"{row.get('p99_ms', 0):>7.1f} {row.get('retries', 0):>7}\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Phrase API 吞吐量基準測試(使用模擬伺服器)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="每次測試的 job 數")
+    parser.add_argument("--scenarios", nargs="+", choices=["list", "download", "update"],
+                        default=["list", "download", "update"])
+    parser.add_argument("--engine", choices=[core.ThreadEngine.name, core.AsyncEngine.name],
+                        default=core.ThreadEngine.name)
+    parser.add_argument("--url", help="使用已啟動的伺服器(BASE_URL 格式,結尾為 /web),不啟動內建模擬伺服器")
+    parser.add_argument("--status", default="COMPLETED", choices=core.JOB_STATUSES, help="批量更新的目標狀態")
+    parser.add_argument("--latency", type=float, default=0.01, help="模擬伺服器每個請求的延遲(秒)")
+    parser.add_argument("--latency-per-job", type=float, default=0.0)
+    parser.add_argument("--payload-size", type=int, default=2048, help="每個 job 的 MXLIFF 大約位元組數")
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--user-rps", type=int, default=0, help="模擬伺服器每個使用者每秒的請求上限")
+    parser.add_argument("--accounts", type=int, default=0, help="使用帳號池引擎與指定數量的服務帳號")
+    parser.add_argument("--json", help="將結果寫入 JSON 檔")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    work_dir = tempfile.mkdtemp(prefix="phrase_benchmark_")
+    core.configure_logging(log_file=os.path.join(work_dir, "benchmark.log"),
+                           job_log_file=os.path.join(work_dir, "job_events.jsonl"))
+    # phrase_core 在第一次使用時才建立這些檔案,在此之前改到暫存目錄即可
+    core.LISTING_CACHE = core.ListingCache(os.path.join(work_dir, "listing_cache.sqlite3"), ttl=0)
+    core.PROJECT_INDEX = core.ProjectIndex(os.path.join(work_dir, "listing_cache.sqlite3"))
+    core.REPORT_DIR = os.path.join(work_dir, "reports")
+    core.JOURNAL_DIR = os.path.join(work_dir, "journals")
+    try:
+        all_results = []
+        for size in args.sizes:
+            sys.stdout.write(f"Running {size} jobs...\n")
+            sys.stdout.flush()
+            all_results.append(run_size(args, size, work_dir))
+        print_results(all_results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"engine": core.PoolEngine.name if args.accounts else args.engine, "accounts": args.accounts,
+                           "user_rps": args.user_rps, "results": all_results}, f, indent=1)
+    except core.PhraseError as e:
+        sys.stderr.write(f"Error: {e}\n")
+        return 2
+    finally:
+        core.shutdown_logging()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+""" Phrase TMS 命令列工具(不需要 GUI),可在排程或伺服器上批量更新任務狀態與下載雙語檔案
+
+    python phrase_cli.py login --username USER            (密碼由 PHRASE_PASSWORD 或互動輸入取得)
+    python phrase_cli.py update-status --project NAME --workflow Translation --status COMPLETED
+    python phrase_cli.py download --project NAME --lang de --mode separate --output ./out
+    python phrase_cli.py projects "acme 2024"                       (同步並搜尋離線專案索引)
+"""
+import argparse
+import getpass
+import os
+import signal
+import sys
+import threading
+
+import phrase_core as core
+
+MODES = {"merged": core.MODE_MERGED, "separate": core.MODE_SEPARATE}
+
+
+def log_to_stdout(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def ensure_login(args):
+    """ 優先使用儲存的 token;沒有有效 token 時以帳號密碼登入 """
+    username = args.username or os.environ.get("PHRASE_USERNAME")
+    credentials = core.restore_session()
+    if core.CLIENT.token and (not username or username == credentials["username"]):
+        return
+    login_with_password(username)
+
+
+def login_with_password(username):
+    if not username:
+        raise core.PhraseError("沒有有效的 token,請提供 --username 或設定 PHRASE_USERNAME")
+    password = os.environ.get("PHRASE_PASSWORD") or getpass.getpass(f"{username} 的密碼: ")
+    core.login(username, password)
+
+
+def relogin(args):
+    """ 作業途中 token 過期時,以帳號密碼重新登入(不使用儲存的 token) """
+    credentials = core.load_credentials() or {}
+    login_with_password(args.username or os.environ.get("PHRASE_USERNAME") or credentials.get("username"))
+
+
+def find_projects(args, engine):
+    projects = core.search_projects(engine, args.project, args.client)
+    if not projects:
+        raise core.PhraseError("未找到符合條件的專案")
+    for project in projects:
+        log_to_stdout(f"專案: {project['name']} ({project['uid']})\n")
+    return projects
+
+
+def run_cancellable(func, *args, **kwargs):
+    """ 在工作執行緒執行 func,主執行緒收到 Ctrl-C 時設定 cancel_event,等待進行中的請求結束後回傳;
+        func 拋出的例外在主執行緒重新拋出
+    """
+    cancel_event = threading.Event()
+    done = threading.Event()
+    result = {}
+
+    def run():
+        try:
+            result["value"] = func(*args, log=log_to_stdout, cancel_event=cancel_event, **kwargs)
+        except BaseException as e:
+            result["error"] = e
+        finally:
+            done.set()
+
+    worker = threading.Thread(target=run, name=func.__name__)
+    worker.start()
+    # 以 done 判斷是否結束:join 被 Ctrl-C 中斷後 is_alive() 可能在工作執行緒仍在執行時回傳 False
+    while not done.is_set():
+        try:
+            done.wait(0.2)
+        except KeyboardInterrupt:
+            if cancel_event.is_set():
+                raise
+            log_to_stdout("正在取消...\n")
+            cancel_event.set()
+    worker.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"], cancel_event.is_set()
+
+
+def cmd_login(args):
+    ensure_login(args)
+    log_to_stdout("登入成功\n")
+    return 0
+
+
+def cmd_update_status(args):
+    ensure_login(args)
+    engine = core.get_engine(args.engine)
+    projects = find_projects(args, engine)
+    totals, cancelled = run_cancellable(core.update_all_jobs_status, engine, projects, args.workflow, args.status,
+                                        resume=not args.restart)
+    while totals["token_expired"] and not cancelled:
+        # 重新登入後以相同參數再次執行,已是目標狀態的 jobs 不再送出,記錄中的 jobs 計入先前已完成
+        log_to_stdout("Token 已過期,重新登入後從中斷處繼續\n")
+        relogin(args)
+        totals, cancelled = run_cancellable(core.update_all_jobs_status, engine, projects, args.workflow,
+                                            args.status)
+    log_to_stdout(f"成功 {totals['success']} 個,失敗 {totals['failed']} 個,已是 {args.status} 而略過 {totals['noop']} 個,"
+                  f"先前已完成 {totals['resumed']} 個\n")
+    return 1 if totals["failed"] or cancelled else 0
+
+
+def cmd_download(args):
+    ensure_login(args)
+    engine = core.get_engine(args.engine)
+    projects = find_projects(args, engine)
+    target_langs = args.lang or sorted({lang for p in projects for lang in p.get('targetLangs', [])})
+    if not target_langs:
+        raise core.PhraseError("所選專案沒有目標語言")
+    os.makedirs(args.output, exist_ok=True)
+    summary, cancelled = run_cancellable(core.download_bilingual_files_by_language, engine, projects, target_langs,
+                                         args.output, MODES[args.mode], args.workflow, not args.full,
+                                         merge_chunk_size=args.chunk_size or None, compress=args.gzip,
+                                         archive=args.zip)
+    log_to_stdout(f"下載 {summary['downloaded']} 個,失敗 {summary['failed']} 個,未變更略過 {summary['skipped']} 個\n")
+    return 1 if summary["failed"] or cancelled else 0
+
+
+def cmd_projects(args):
+    if args.offline:
+        core.restore_session()
+    else:
+        ensure_login(args)
+        core.sync_project_index(core.get_engine(args.engine), full=args.full_sync, log=log_to_stdout)
+    for project in core.PROJECT_INDEX.search(" ".join(args.query), limit=args.limit):
+        owner = project.get('owner') or {}
+        log_to_stdout(f"{project['dateCreated'][:10]}  {project.get('internalId', '')}  {project['name']}  "
+                      f"[{(project.get('client') or {}).get('name', '')}] "
+                      f"{owner.get('firstName', '')} {owner.get('lastName', '')}  ({project['uid']})\n")
+    return 0
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--username", help="Phrase 帳號(預設讀取 PHRASE_USERNAME,密碼讀取 PHRASE_PASSWORD)")
+    common.add_argument("--engine", choices=[core.ThreadEngine.name, core.AsyncEngine.name, core.PoolEngine.name],
+                        default=core.ThreadEngine.name,
+                        help="傳輸引擎(asyncio 需要 httpx;pool 使用 accounts.json 的多個服務帳號)")
+    common.add_argument("-v", "--verbose", action="store_true", help="同時在 stderr 輸出詳細日誌")
+
+    parser = argparse.ArgumentParser(description="Phrase TMS 任務狀態更新與雙語檔案下載(命令列版)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    login_parser = subparsers.add_parser("login", parents=[common], help="登入並儲存 token")
+    login_parser.set_defaults(func=cmd_login)
+
+    def add_project_args(sub):
+        sub.add_argument("--project", action="append", default=[], help="專案名稱(可重複指定)")
+        sub.add_argument("--client", help="客戶名稱")
+        sub.add_argument("--workflow", default=core.NO_WORKFLOW, help="工作流程名稱(預設 No Workflow)")
+
+    status_parser = subparsers.add_parser("update-status", parents=[common], help="批量更新任務狀態")
+    add_project_args(status_parser)
+    status_parser.add_argument("--status", required=True, choices=core.JOB_STATUSES)
+    status_parser.add_argument("--restart", action="store_true",
+                               help="捨棄先前中斷的進度記錄,統計從零開始(已是目標狀態的 jobs 仍會略過)")
+    status_parser.set_defaults(func=cmd_update_status)
+
+    download_parser = subparsers.add_parser("download", parents=[common], help="下載雙語 MXLIFF 檔案")
+    add_project_args(download_parser)
+    download_parser.add_argument("--lang", action="append", default=[],
+                                 help="目標語言(可重複指定,預設為專案的所有目標語言)")
+    download_parser.add_argument("--mode", choices=sorted(MODES), default="merged",
+                                 help="merged: 一個語言一個檔案;separate: 每個 job 一個檔案")
+    download_parser.add_argument("--output", default=".", help="儲存目錄")
+    download_parser.add_argument("--chunk-size", type=int, default=0,
+                                 help="merged 模式下每個請求的 jobs 數,分段平行下載後在本機合併(0 表示由伺服器合併)")
+    download_parser.add_argument("--gzip", action="store_true", help="以 gzip 壓縮儲存每個檔案(.mxliff.gz)")
+    download_parser.add_argument("--zip", action="store_true",
+                                 help="所有檔案寫入 --output 下的單一 ZIP(不使用下載記錄)")
+    download_parser.add_argument("--full", action="store_true", help="忽略下載記錄,重新下載所有檔案")
+    download_parser.set_defaults(func=cmd_download)
+
+    projects_parser = subparsers.add_parser("projects", parents=[common], help="同步並搜尋離線專案索引")
+    projects_parser.add_argument("query", nargs="*", help="關鍵字(名稱、客戶、internalId 或負責人,全部需符合)")
+    projects_parser.add_argument("--offline", action="store_true", help="不同步,只搜尋本機索引")
+    projects_parser.add_argument("--full-sync", action="store_true", help="重新列出所有專案")
+    projects_parser.add_argument("--limit", type=int, default=core.INDEX_SEARCH_LIMIT)
+    projects_parser.set_defaults(func=cmd_projects)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    core.configure_logging(console=args.verbose)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    try:
+        return args.func(args)
+    except (core.PhraseError, OSError) as e:
+        sys.stderr.write(f"Error: {e}\n")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2420 @@
+""" Phrase TMS API 核心功能(不依賴 GUI):登入、專案與 job 清單、雙語檔案下載與狀態更新
+    錯誤以例外回報,進度以 log 回呼函式回報,可供 GUI、命令列或排程程式共用
+"""
+import asyncio
+import atexit
+import collections
+import concurrent.futures
+import contextlib
+import email.utils
+import functools
+import gzip
+import hashlib
+import importlib.util
+import itertools
+import json
+import logging
+import logging.handlers
+import math
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx  # 選用:asyncio 傳輸引擎需要 httpx(HTTP/2 另需 h2)
+except ImportError:
+    httpx = None
+
+# 設定檔與快取的存放位置(考慮打包後的路徑)
+if getattr(sys, 'frozen', False):
+    BASE_DIR = os.path.dirname(sys.executable)
+else:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BASE_URL = os.environ.get("PHRASE_BASE_URL", "https://cloud.memsource.com/web")  # 可用環境變數指向其他伺服器
+MAX_WORKERS = 50  # 同時進行的 API 請求上限,連線池大小與此一致
+MAX_PAGE_SIZE = 50  # Phrase API 分頁查詢允許的最大 pageSize
+PAGE_FETCH_WORKERS = 8  # 分頁查詢時同時抓取的頁數上限
+SEARCH_WORKERS = 8  # 多個專案名稱同時查詢的上限
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 下載時每次寫入磁碟的區塊大小 (1 MB)
+ACCEPT_ENCODING = "gzip, deflate"  # 所有 API 請求明確要求的傳輸壓縮
+COMPRESSED_ENCODINGS = {"gzip", "deflate"}
+COMPRESSION_MIN_SIZE = 1024  # 小於此大小的回應伺服器通常不壓縮,不視為異常
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]  # 需要重試的 HTTP 狀態碼
+THROTTLE_STATUS_CODES = [429, 503]  # 代表伺服器要求降速的狀態碼,觸發該端點的同時請求數減半
+RATE_LIMIT_STATUS_CODES = [429]  # 代表超過速率限制的狀態碼,另外將整體請求速率減半
+THROTTLE_COOLDOWN = 1.0  # 多個進行中的請求同時被限流時只減半一次:距上次減半未滿此秒數時不再減半
+REQUEST_TIMEOUT = 60.0  # 每個請求的連線與讀取逾時(秒,兩個引擎相同),連線卡住時釋放限流配額與連線池的連線
+ASYNC_MAX_IN_FLIGHT = 200  # asyncio 引擎同時進行的請求上限
+ASYNC_FILE_WORKERS = 8  # asyncio 引擎寫入檔案的執行緒數(寫入不在事件迴圈上進行)
+REQUESTS_PER_SECOND = None  # 整體請求速率的上限(所有端點共用);None 表示不設上限,只在收到 429 後依實際速率調整
+MIN_REQUESTS_PER_SECOND = 1.0  # 收到 429 後請求速率最低降到此值
+RATE_INCREASE = 5.0  # 被限流後每秒約提高的請求速率(每個成功回應增加 RATE_INCREASE / 目前速率)
+RATE_WINDOW = 1.0  # 計算實際請求速率的時間區間(秒)
+ENDPOINT_LIMITS = {  # 各端點同時請求數上限(AIMD 調整的天花板),可由 rate_limits.json 覆寫;執行緒引擎另受 MAX_WORKERS 限制
+    "login": 1,
+    "projects": 8,
+    "jobs": 8,
+    "bilingualFile": ASYNC_MAX_IN_FLIGHT,
+    "setStatus": ASYNC_MAX_IN_FLIGHT,
+}
+DEFAULT_ENDPOINT_LIMIT = 8  # 未列在 ENDPOINT_LIMITS 的端點
+GZIP_SUFFIX = ".gz"  # 壓縮輸出時附加在 .mxliff 後的副檔名
+ZIP_SPOOL_BUDGET = 64 * 1024 * 1024  # ZIP 輸出時所有下載中與等待寫入的檔案合計暫存在記憶體的上限
+ZIP_SPOOL_MIN_SIZE = 64 * 1024  # 每個檔案暫存在記憶體的最小上限,超過時改用本機暫存檔
+DOWNLOAD_QUEUE_SIZE = 200  # 列出 jobs 後等待下載的工作數上限,下載較慢時列表暫停(最多預先抓取 PAGE_FETCH_WORKERS 頁),不會一次列出全部
+ZIP_QUEUE_SIZE = 16  # 等待寫入 ZIP 的檔案數上限,避免下載速度大於寫入速度時暫存無限增加
+MERGE_CHUNK_SIZE = 50  # 分段合併下載時每個 bilingualFile 請求包含的 jobs 數
+MXLIFF_SCAN_SIZE = 64 * 1024  # 合併 MXLIFF 時尋找根元素開始/結束標籤所讀取的範圍
+CACHE_TTL_SECONDS = 300  # 專案與 job 清單快取的有效時間
+INDEX_FULL_SYNC_SECONDS = 24 * 3600  # 專案索引完整重新同步的間隔(API 只能依建立時間增量查詢,修改與刪除靠完整同步更新)
+INDEX_SEARCH_LIMIT = 500  # 專案索引搜尋回傳的筆數上限
+LOG_FILE = os.path.join(BASE_DIR, "job_status_update.log")
+JOB_LOG_FILE = os.path.join(BASE_DIR, "job_events.jsonl")  # 每個 job 的處理結果(每行一筆 JSON)
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+REPORT_DIR = os.path.join(BASE_DIR, "reports")  # 每次執行結束時寫入的 API 效能報告
+REPORT_QUANTILES = [0.5, 0.9, 0.99]
+JOURNAL_DIR = os.path.join(BASE_DIR, "journals")  # 批量更新狀態的進度記錄,中斷後可從記錄繼續
+JOURNAL_MAX_AGE_SECONDS = 24 * 3600  # 最後一筆記錄超過此秒數的中斷記錄視為過期,不再繼續
+CREDENTIALS_FILE = os.path.join(BASE_DIR, "credentials.json")
+RATE_LIMITS_FILE = os.path.join(BASE_DIR, "rate_limits.json")
+ACCOUNTS_FILE = os.path.join(BASE_DIR, "accounts.json")  # 帳號池的服務帳號設定(選用)
+CACHE_FILE = os.path.join(BASE_DIR, "listing_cache.sqlite3")
+NO_WORKFLOW = "No Workflow"
+MODE_MERGED = "合併下載"  # 一個語言一個檔案
+MODE_SEPARATE = "單獨下載"  # 每個 job 一個檔案
+STATUS_UPDATED = "Status updated successfully"
+JOB_STATUSES = ["NEW", "ACCEPTED", "DECLINED", "REJECTED", "DELIVERED", "EMAILED", "COMPLETED", "CANCELLED"]
+
+token_lock = threading.Lock()
+token_expired_listeners = []  # Token 過期時呼叫的函式(例如 GUI 更新登入狀態)
+job_logger = logging.getLogger("phrase.jobs")
+_log_listener = None
+
+
+class PhraseError(Exception):
+    """ Phrase API 操作失敗 """
+
+
+class TokenExpiredError(PhraseError):
+    """ API 回傳 401,token 已過期或無效 """
+    MESSAGE = "Token expired"  # 也是 update_job_status 遇到 401 時的回傳值
+
+    def __init__(self):
+        super().__init__(self.MESSAGE)
+
+
+class DownloadCancelled(Exception):
+    """ 下載途中使用者取消作業 """
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """ 將 log_job_event 的紀錄格式化為一行 JSON """
+
+    def format(self, record):
+        event = {"time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+                 "level": record.levelname, **record.job_event}
+        return json.dumps(event, ensure_ascii=False)
+
+
+def configure_logging(log_file=LOG_FILE, job_log_file=JOB_LOG_FILE, level=logging.INFO, console=False):
+    """ 設定非同步日誌:所有執行緒只把紀錄放進佇列(QueueHandler),由 QueueListener 的執行緒寫入
+        文字日誌(log_file)、job 結構化紀錄(job_log_file,JSONL)與 console=True 時的 stderr;程式結束時自動清空佇列
+    """
+    global _log_listener
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    if job_log_file:
+        job_handler = logging.FileHandler(job_log_file, encoding='utf-8')
+        job_handler.setFormatter(JsonLinesFormatter())
+        job_handler.addFilter(lambda record: hasattr(record, "job_event"))
+        handlers.append(job_handler)
+
+    if _log_listener is not None:
+        _log_listener.stop()
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    root_logger = logging.getLogger()
+    root_logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root_logger.setLevel(level)
+    _log_listener.start()
+
+
+def shutdown_logging():
+    """ 寫出佇列中剩餘的紀錄並停止日誌執行緒 """
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def log_job_event(message, **fields):
+    """ 記錄單一 job(或合併下載)的處理結果:文字日誌寫入 message,JSONL 寫入 fields """
+    job_logger.info(message, extra={"job_event": fields})
+
+
+def endpoint_name(path):
+    """ 以 API 路徑的最後一段作為限流器的端點分組,例如 setStatus、bilingualFile、jobs """
+    return path.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+
+
+def parse_retry_after(value):
+    """ 解析 Retry-After 標頭(秒數或 HTTP 日期),回傳秒數;無法解析時回傳 None """
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    try:
+        retry_time = email.utils.parsedate_to_datetime(value)
+        return max(0.0, (retry_time - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def load_rate_limits():
+    """ 從 rate_limits.json 讀取限流設定(選用),格式:
+        {"requests_per_second": 20, "endpoints": {"setStatus": 30, "bilingualFile": 5}}
+        requests_per_second 為固定的速率上限,省略時不設上限
+    """
+    settings = {"rate": REQUESTS_PER_SECOND, "ceilings": dict(ENDPOINT_LIMITS)}
+    try:
+        if os.path.exists(RATE_LIMITS_FILE):
+            with open(RATE_LIMITS_FILE, 'r') as f:
+                config = json.load(f)
+            settings["rate"] = config.get("requests_per_second", settings["rate"])
+            settings["ceilings"].update(config.get("endpoints", {}))
+    except (json.JSONDecodeError, IOError) as e:
+        logging.error(f"Failed to load rate limits: {type(e).__name__} - {str(e)}")
+    return settings
+
+
+class AdaptiveLimiter:
+    """ 所有端點共用的自適應限流器
+        - token bucket:限制整體請求速率。預設不設上限,收到 429 時降到最近 RATE_WINDOW 秒實際速率的一半,
+          之後每個成功回應逐步提高(約每秒 RATE_INCREASE),直到 rate_limits.json 設定的上限(沒有設定時不設上限)
+        - AIMD:每個端點的同時請求數在成功時緩慢增加(最多到天花板),收到 429/503 時減半
+        - 回應附有 Retry-After 時暫停所有端點(Phrase 的限流以使用者為單位);沒有 Retry-After 時
+          只有該請求以指數退避等待(由呼叫端負責),不影響其他請求
+        同時提供執行緒(acquire)與 asyncio(acquire_async)兩種等待方式
+    """
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, ceilings=None):
+        self.max_rate = float(rate) if rate else math.inf
+        self.rate = self.max_rate
+        self.tokens = 0.0 if math.isinf(self.rate) else max(1.0, self.rate)
+        self.refilled_at = time.monotonic()
+        self.paused_until = 0.0
+        self.sent = collections.deque()  # 最近 RATE_WINDOW 秒內取得配額的時間,用於計算實際速率
+        self.rate_cut_at = -math.inf
+        self.ceilings = dict(ENDPOINT_LIMITS if ceilings is None else ceilings)
+        self.limits = {}
+        self.limit_cut_at = {}
+        self.in_flight = {}
+        self.condition = threading.Condition()
+
+    def ceiling(self, endpoint):
+        return self.ceilings.get(endpoint, DEFAULT_ENDPOINT_LIMIT)
+
+    def _try_acquire(self, endpoint):
+        """ 嘗試取得一個請求配額;成功回傳 0,否則回傳建議等待的秒數(需持有 condition) """
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        limit = self.limits.setdefault(endpoint, float(self.ceiling(endpoint)))
+        if self.in_flight.get(endpoint, 0) >= int(limit):
+            return 0.05
+        if not math.isinf(self.rate):
+            self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.refilled_at) * self.rate)
+            self.refilled_at = now
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+        self.sent.append(now)
+        while self.sent[0] < now - RATE_WINDOW:
+            self.sent.popleft()
+        self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) + 1
+        return 0
+
+    def acquire(self, endpoint):
+        with self.condition:
+            while True:
+                wait = self._try_acquire(endpoint)
+                if not wait:
+                    return
+                self.condition.wait(wait)
+
+    async def acquire_async(self, endpoint):
+        while True:
+            with self.condition:
+                wait = self._try_acquire(endpoint)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def feedback(self, endpoint, status_code, retry_after=None):
+        """ 依回應狀態調整該端點的同時請求數與整體請求速率 """
+        with self.condition:
+            now = time.monotonic()
+            limit = self.limits.get(endpoint, float(self.ceiling(endpoint)))
+            if status_code in THROTTLE_STATUS_CODES:
+                if now - self.limit_cut_at.get(endpoint, -math.inf) >= THROTTLE_COOLDOWN:
+                    self.limit_cut_at[endpoint] = now
+                    self.limits[endpoint] = max(1.0, limit / 2)
+                    logging.warning(f"Throttled on {endpoint} ({status_code}): concurrency "
+                                    f"{limit:.1f} -> {self.limits[endpoint]:.1f}")
+                if status_code in RATE_LIMIT_STATUS_CODES and now - self.rate_cut_at >= THROTTLE_COOLDOWN:
+                    self.rate_cut_at = now
+                    rate = self.rate
+                    measured = len([t for t in self.sent if t >= now - RATE_WINDOW]) / RATE_WINDOW
+                    self.rate = max(MIN_REQUESTS_PER_SECOND, min(rate, measured) / 2)
+                    self.tokens = 0.0
+                    self.refilled_at = now
+                    logging.warning(f"Rate limited on {endpoint}: {min(rate, measured):.1f} -> {self.rate:.1f} req/s")
+                if retry_after is not None:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+                    self.tokens = 0.0
+                    logging.warning(f"Throttled on {endpoint} ({status_code}): pausing {retry_after:.1f}s")
+            elif status_code < 400:
+                # 每個成功回應增加 1/limit,約等於每一輪請求增加 1
+                self.limits[endpoint] = min(float(self.ceiling(endpoint)), limit + 1 / limit)
+                if self.rate < self.max_rate:
+                    self.rate = min(self.max_rate, self.rate + RATE_INCREASE / self.rate)
+
+    def release(self, endpoint):
+        with self.condition:
+            self.in_flight[endpoint] -= 1
+            self.condition.notify_all()
+
+
+LIMITER = AdaptiveLimiter(**load_rate_limits())
+
+
+def _quantile(sorted_values, q):
+    """ 最近秩(nearest-rank)百分位數 """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))]
+
+
+class RequestMetrics:
+    """ 收集每個 API 呼叫的端點、狀態碼、延遲、傳輸位元組、重試次數與排隊時間,
+        執行結束時依端點彙總百分位數與吞吐量,輸出 JSON 報告與 Prometheus 文字格式檔案
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.begin_run("idle")
+
+    def begin_run(self, name):
+        """ 開始新的統計區間(清除先前的紀錄) """
+        with self._lock:
+            self.run_name = name
+            self.started = time.time()
+            self.samples = {}  # 端點 → 每個請求的 (狀態, 延遲, 總時間, 位元組, 重試, 排隊時間, 被限流次數)
+
+    def record(self, endpoint, status, latency, duration, num_bytes, retries, queued, throttled):
+        """ status 為 HTTP 狀態碼,連線錯誤等例外為 "error";latency 為收到回應標頭的時間,duration 含讀取內容 """
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(
+                (str(status), latency, duration, num_bytes, retries, queued, throttled))
+
+    def summary(self):
+        """ 回傳依端點彙總的統計資料(秒、位元組) """
+        with self._lock:
+            samples = {endpoint: list(items) for endpoint, items in self.samples.items()}
+            started = self.started
+        wall = max(time.time() - started, 1e-9)
+        endpoints = {}
+        for endpoint, items in sorted(samples.items()):
+            statuses = {}
+            for item in items:
+                statuses[item[0]] = statuses.get(item[0], 0) + 1
+            latencies = sorted(item[1] for item in items)
+            queued = sorted(item[5] for item in items)
+            num_bytes = sum(item[3] for item in items)
+            endpoints[endpoint] = {
+                "requests": len(items),
+                "errors": sum(n for status, n in statuses.items() if not status.isdigit() or int(status) >= 400),
+                "status_codes": statuses,
+                "retries": sum(item[4] for item in items),
+                "throttled": sum(item[6] for item in items),
+                "bytes": num_bytes,
+                "latency_seconds": {**{f"p{int(q * 100)}": _quantile(latencies, q) for q in REPORT_QUANTILES},
+                                    "max": latencies[-1], "mean": sum(latencies) / len(latencies),
+                                    "sum": sum(latencies)},
+                "duration_seconds_sum": sum(item[2] for item in items),
+                "queue_seconds": {**{f"p{int(q * 100)}": _quantile(queued, q) for q in REPORT_QUANTILES},
+                                  "max": queued[-1], "mean": sum(queued) / len(queued), "sum": sum(queued)},
+                "requests_per_second": len(items) / wall,
+                "bytes_per_second": num_bytes / wall,
+            }
+        return {
+            "run": self.run_name,
+            "started": datetime.fromtimestamp(started, timezone.utc).isoformat(),
+            "wall_seconds": wall,
+            "endpoints": endpoints,
+        }
+
+    @staticmethod
+    def prometheus_text(summary):
+        """ 將 summary() 轉為 Prometheus 文字格式(可由 node_exporter 的 textfile collector 讀取) """
+        lines = []
+
+        def metric(name, kind, help_text, rows):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in rows:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        endpoints = summary["endpoints"]
+        metric("phrase_requests_total", "counter", "Phrase API requests by endpoint and status code.",
+               [({"endpoint": ep, "status": status}, n)
+                for ep, data in endpoints.items() for status, n in sorted(data["status_codes"].items())])
+        for name, field, help_text in (
+                ("phrase_request_latency_seconds", "latency_seconds", "Time until response headers arrived."),
+                ("phrase_request_queue_seconds", "queue_seconds", "Time spent waiting for the rate limiter.")):
+            rows = []
+            for ep, data in endpoints.items():
+                rows += [({"endpoint": ep, "quantile": str(q)}, data[field][f"p{int(q * 100)}"])
+                         for q in REPORT_QUANTILES]
+            metric(name, "summary", help_text, rows)
+            lines += [f'{name}_sum{{endpoint="{ep}"}} {data[field]["sum"]}' for ep, data in endpoints.items()]
+            lines += [f'{name}_count{{endpoint="{ep}"}} {data["requests"]}' for ep, data in endpoints.items()]
+        metric("phrase_response_bytes_total", "counter", "Response bytes received (on the wire).",
+               [({"endpoint": ep}, data["bytes"]) for ep, data in endpoints.items()])
+        metric("phrase_request_retries_total", "counter", "Retried attempts.",
+               [({"endpoint": ep}, data["retries"]) for ep, data in endpoints.items()])
+        metric("phrase_requests_throttled_total", "counter", "Attempts answered with 429/503.",
+               [({"endpoint": ep}, data["throttled"]) for ep, data in endpoints.items()])
+        metric("phrase_requests_per_second", "gauge", "Average request throughput over the run.",
+               [({"endpoint": ep}, data["requests_per_second"]) for ep, data in endpoints.items()])
+        metric("phrase_run_wall_seconds", "gauge", "Duration of the run.", [({"run": summary["run"]},
+                                                                                summary["wall_seconds"])])
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, directory=None):
+        """ 寫出 JSON 報告與 .prom 檔(預設寫入 REPORT_DIR),回傳 JSON 報告的路徑;寫入失敗時只記錄錯誤並回傳 None """
+        directory = directory or REPORT_DIR
+        summary = self.summary()
+        # 檔名加上微秒與 PID,同一秒內結束的多次執行(或多個程序)不會互相覆寫報告
+        base = os.path.join(directory, f"{summary['run']}_{datetime.now():%Y%m%d_%H%M%S_%f}_{os.getpid()}")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with atomic_output(f"{base}.json") as f:
+                f.write(json.dumps(summary, ensure_ascii=False, indent=1).encode('utf-8'))
+            with atomic_output(f"{base}.prom") as f:
+                f.write(self.prometheus_text(summary).encode('utf-8'))
+        except OSError as e:
+            logging.error(f"Failed to write run report: {type(e).__name__} - {str(e)}")
+            return None
+        logging.info(f"Run report written to {base}.json")
+        return f"{base}.json"
+
+
+METRICS = RequestMetrics()
+
+
+class RequestTiming:
+    """ 單一 API 呼叫(含重試)的計時資料,由 _send 建立並附在 response 上,讀完內容後由 finish 記錄到 METRICS """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.queued = 0.0
+        self.started = None
+        self.latency = 0.0
+        self.retries = 0
+        self.throttled = 0
+
+    def acquired(self, wait_started):
+        self.queued += time.monotonic() - wait_started
+        self.started = time.monotonic()
+
+    def responded(self, status_code, attempt):
+        self.latency = time.monotonic() - self.started
+        self.retries = attempt
+        if status_code in THROTTLE_STATUS_CODES:
+            self.throttled += 1
+
+    def finish(self, status, num_bytes):
+        METRICS.record(self.endpoint, status, self.latency, time.monotonic() - self.started, num_bytes,
+                       self.retries, self.queued, self.throttled)
+
+
+def _wire_bytes(response):
+    """ requests 回應實際接收的位元組數(壓縮前);無法取得時以解壓後內容長度代替 """
+    try:
+        return response.raw.tell()
+    except (AttributeError, ValueError):
+        return len(response.content or b"")
+
+
+class PhraseClient:
+    """ 所有 Phrase API 呼叫共用的連線層:keep-alive 連線池、認證標頭、限流與重試策略 """
+
+    def __init__(self, base_url=BASE_URL, pool_size=MAX_WORKERS, retries=3, backoff_factor=1, limiter=LIMITER):
+        self.base_url = base_url
+        self.token = None
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.limiter = limiter
+        self.session = requests.Session()
+        # 連線層只重試連線錯誤;依狀態碼的重試由 _send 處理,才能把 429/503 回報給限流器
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=None,
+                      allowed_methods=frozenset(["GET", "POST"]))
+        # pool_block=True:連線數達上限時等待可用連線,而不是另開一條用完即丟的連線
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json", "Accept-Encoding": ACCEPT_ENCODING})
+        self.encodings = {}  # 端點 → {Content-Encoding: 回應數},供確認傳輸壓縮是否生效
+        self._encoding_lock = threading.Lock()
+
+    def check_encoding(self, endpoint, headers):
+        """ 記錄回應的 Content-Encoding;較大的回應未經 gzip/deflate 壓縮時,每個端點記錄一次警告 """
+        encoding = headers.get("Content-Encoding", "identity").lower()
+        with self._encoding_lock:
+            counts = self.encodings.setdefault(endpoint, {})
+            counts[encoding] = counts.get(encoding, 0) + 1
+            first_seen = counts[encoding] == 1
+        length = headers.get("Content-Length")
+        if (first_seen and encoding not in COMPRESSED_ENCODINGS
+                and (length is None or int(length) >= COMPRESSION_MIN_SIZE)):
+            logging.warning(f"Response from {endpoint} is not compressed (Content-Encoding: {encoding})")
+
+    def set_token(self, token):
+        self.token = token
+        self.session.headers["Authorization"] = f"ApiToken {token}"
+
+    def clear_token(self):
+        self.token = None
+        self.session.headers.pop("Authorization", None)
+
+    def _send(self, method, path, **kwargs):
+        """ 經限流器送出請求,遇到 429/5xx 時重試並記錄計時資料;回傳的 response 仍占用一個限流配額,
+            呼叫端需在讀完內容後呼叫 limiter.release 與 response.phrase_timing.finish
+        """
+        endpoint = endpoint_name(path)
+        timing = RequestTiming(endpoint)
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        for attempt in range(self.retries + 1):
+            wait_started = time.monotonic()
+            self.limiter.acquire(endpoint)
+            timing.acquired(wait_started)
+            try:
+                response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+            except BaseException:
+                self.limiter.release(endpoint)
+                timing.responded(None, attempt)
+                timing.finish("error", 0)
+                raise
+            timing.responded(response.status_code, attempt)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            self.limiter.feedback(endpoint, response.status_code, retry_after)
+            self.check_encoding(endpoint, response.headers)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                response.phrase_timing = timing
+                return response
+            response.close()
+            self.limiter.release(endpoint)
+            if response.status_code not in THROTTLE_STATUS_CODES or retry_after is None:
+                # 附 Retry-After 的 429/503 由限流器的暫停負責,其他情況只有這個請求以指數退避等待
+                time.sleep(self.backoff_factor * (2 ** attempt))
+
+    def request(self, method, path, **kwargs):
+        response = self._send(method, path, **kwargs)
+        self.limiter.release(endpoint_name(path))
+        response.phrase_timing.finish(response.status_code, _wire_bytes(response))
+        return response
+
+    @contextlib.contextmanager
+    def stream(self, method, path, **kwargs):
+        """ 串流請求:限流配額保留到回應內容讀取完畢為止 """
+        response = self._send(method, path, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            num_bytes = response.raw.tell()
+            response.close()
+            self.limiter.release(endpoint_name(path))
+            response.phrase_timing.finish(response.status_code, num_bytes)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def iter_pages(self, path, params=None):
+        """ 依頁碼順序產生分頁查詢每一頁的 content:先取第一頁得知 totalPages,其餘頁面最多 PAGE_FETCH_WORKERS 頁同時抓取,
+            每抓到一頁就回傳,呼叫端不必等全部頁面抓完;呼叫端暫停取用時不再送出新的頁面請求
+        """
+        params = dict(params or {})
+        params["pageSize"] = MAX_PAGE_SIZE
+
+        def fetch_page(page):
+            response = self.get(path, params={**params, "pageNumber": page})
+            response.raise_for_status()
+            return response.json()
+
+        first = fetch_page(0)
+        yield first.get("content", [])
+        total_pages = first.get("totalPages", 1)
+        if total_pages > 1:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(PAGE_FETCH_WORKERS, total_pages - 1))
+            pending = collections.deque()  # 依頁碼順序排列的請求,回傳順序與分頁順序相同
+            try:
+                for page in range(1, total_pages):
+                    pending.append(executor.submit(fetch_page, page))
+                    if len(pending) < PAGE_FETCH_WORKERS:
+                        continue
+                    yield pending.popleft().result().get("content", [])
+                while pending:
+                    yield pending.popleft().result().get("content", [])
+            finally:
+                # 中途停止或失敗時,尚未開始的頁面不再送出,也不等待進行中的頁面
+                for future in pending:
+                    future.cancel()
+                executor.shutdown(wait=False)
+
+    def get_all_pages(self, path, params=None):
+        """ 抓取分頁查詢的所有結果,依頁碼順序回傳 """
+        return [item for page in self.iter_pages(path, params) for item in page]
+
+
+CLIENT = PhraseClient()
+
+
+class AccountClient(PhraseClient):
+    """ 帳號池中的一個服務帳號:自己的 token、限流器(Phrase 的限流以使用者為單位)與連線池
+        請求收到 401 時以帳號密碼重新登入並重送一次;多個執行緒同時遇到 401 時只登入一次
+    """
+
+    def __init__(self, username, password, **kwargs):
+        super().__init__(limiter=AdaptiveLimiter(**load_rate_limits()), **kwargs)
+        self.username = username
+        self.password = password
+        self.login_lock = threading.Lock()
+
+    def login(self):
+        try:
+            response = self.post("/api2/v1/auth/login", json={"userName": self.username, "password": self.password})
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Login failed for pool account {self.username}: {e}")
+            raise PhraseError(f"帳號 {self.username} 登入失敗: {e}")
+        self.set_token(response.json()["token"])
+        logging.info(f"Pool account logged in: {self.username}")
+
+    def _send(self, method, path, **kwargs):
+        token = self.token
+        response = super()._send(method, path, **kwargs)
+        endpoint = endpoint_name(path)
+        if response.status_code != 401 or endpoint == "login":
+            return response
+        response.close()
+        self.limiter.release(endpoint)
+        response.phrase_timing.finish(response.status_code, 0)
+        with self.login_lock:
+            if self.token == token:  # 其他執行緒尚未重新登入
+                logging.warning(f"Token expired for pool account {self.username}, logging in again")
+                self.login()
+        return super()._send(method, path, **kwargs)
+
+
+def load_accounts():
+    """ 從 accounts.json 讀取帳號池設定(選用),格式:
+        {"accounts": [{"username": "svc1", "password_env": "PHRASE_PASSWORD_SVC1"}, {"username": "svc2", "password": "..."}]}
+        密碼建議以 password_env 指定的環境變數提供;回傳 [(帳號, 密碼), ...],沒有設定時回傳空清單
+    """
+    try:
+        if not os.path.exists(ACCOUNTS_FILE):
+            return []
+        with open(ACCOUNTS_FILE, 'r') as f:
+            config = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        logging.error(f"Failed to load accounts: {type(e).__name__} - {str(e)}")
+        raise PhraseError(f"無法讀取帳號池設定: {str(e)}")
+    accounts = []
+    for account in config.get("accounts", []):
+        password = os.environ.get(account["password_env"]) if "password_env" in account else account.get("password")
+        if not password:
+            raise PhraseError(f"帳號 {account['username']} 沒有密碼(請設定 {account.get('password_env', 'password')})")
+        accounts.append((account["username"], password))
+    return accounts
+
+
+class TokenPool:
+    """ 多個服務帳號的 AccountClient,依序輪流分配給每個 job 的請求 """
+
+    def __init__(self, accounts, pool_size=MAX_WORKERS):
+        if not accounts:
+            raise PhraseError("帳號池沒有設定任何帳號 (accounts.json)")
+        self.clients = [AccountClient(username, password, pool_size=pool_size) for username, password in accounts]
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def login_all(self):
+        """ 平行登入尚未登入的帳號;任何帳號登入失敗時拋出 PhraseError """
+        pending = [client for client in self.clients if client.token is None]
+        if not pending:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            for future in [executor.submit(client.login) for client in pending]:
+                future.result()
+
+    def next_client(self):
+        with self._lock:
+            return self.clients[next(self._counter) % len(self.clients)]
+
+
+class ListingCache:
+    """ 專案與 job 清單的本機快取(SQLite,與 credentials.json 同目錄)
+        - 專案清單以查詢條件 (name, clientName) 為 key,保留 workflowSteps、targetLangs 等完整資料
+        - job 清單以 (project uid, workflowLevel, targetLang) 為 key
+        超過 ttl 秒的資料視為過期並重新查詢;不同帳號的資料分開存放
+        SQLite 檔案在第一次使用時才建立,import 本模組不會寫入磁碟
+    """
+
+    def __init__(self, path, ttl=CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.account = ""
+        self.lock = threading.Lock()
+        self._conn = None
+        self._disabled = False
+
+    def _connect(self):
+        """ 回傳 SQLite 連線(第一次呼叫時開啟並建立資料表),無法使用時回傳 None(需持有 lock) """
+        if self._conn is None and not self._disabled:
+            try:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS listings ("
+                    " kind TEXT, account TEXT, key TEXT, project_uid TEXT, fetched REAL, data TEXT,"
+                    " PRIMARY KEY (kind, account, key))")
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                logging.error(f"Listing cache disabled: {type(e).__name__} - {str(e)}")
+                self._disabled = True
+        return self._conn
+
+    def get(self, kind, key):
+        """ 回傳未過期的快取資料,沒有時回傳 None(資料庫無法讀取時視為未命中) """
+        try:
+            with self.lock:
+                conn = self._connect()
+                if conn is None:
+                    return None
+                row = conn.execute(
+                    "SELECT fetched, data FROM listings WHERE kind = ? AND account = ? AND key = ?",
+                    (kind, self.account, json.dumps(key))).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to read listing cache: {type(e).__name__} - {str(e)}")
+            return None
+        if row and time.time() - row[0] < self.ttl:
+            return json.loads(row[1])
+        return None
+
+    def put(self, kind, key, data, project_uid=None):
+        try:
+            with self.lock:
+                conn = self._connect()
+                if conn is None:
+                    return
+                conn.execute("INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?)",
+                             (kind, self.account, json.dumps(key), project_uid, time.time(), json.dumps(data)))
+                conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to write listing cache: {type(e).__name__} - {str(e)}")
+
+    def get_or_fetch(self, kind, key, fetch, project_uid=None):
+        """ 回傳未過期的快取資料,否則呼叫 fetch() 取得並寫入快取 """
+        data = self.get(kind, key)
+        if data is None:
+            data = fetch()
+            self.put(kind, key, data, project_uid)
+        return data
+
+    def invalidate_jobs(self, project_uid):
+        """ 清除指定專案的所有 job 清單(例如 setStatus 之後) """
+        try:
+            with self.lock:
+                conn = self._connect()
+                if conn is None:
+                    return
+                conn.execute("DELETE FROM listings WHERE kind = 'jobs' AND account = ? AND project_uid = ?",
+                             (self.account, project_uid))
+                conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to invalidate listing cache: {type(e).__name__} - {str(e)}")
+
+    def clear(self):
+        try:
+            with self.lock:
+                conn = self._connect()
+                if conn is None:
+                    return
+                conn.execute("DELETE FROM listings")
+                conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to clear listing cache: {type(e).__name__} - {str(e)}")
+
+
+LISTING_CACHE = ListingCache(CACHE_FILE)
+
+
+def project_search_text(project):
+    """ 專案索引搜尋的比對文字:名稱、客戶、internalId 與負責人(小寫) """
+    owner = project.get('owner') or {}
+    client = project.get('client') or {}
+    fields = [project.get('name'), client.get('name'), project.get('internalId'),
+              owner.get('firstName'), owner.get('lastName'), owner.get('userName')]
+    return " ".join(str(field) for field in fields if field is not None).lower()
+
+
+def filter_projects(projects, query, limit=None, texts=None):
+    """ 以空白分隔的每個關鍵字都需出現在 project_search_text 中(子字串比對);
+        名稱以整個查詢字串開頭的專案排在前面,其餘維持原本順序
+        texts 為預先計算的 project_search_text 清單(與 projects 對應),省略時即時計算
+    """
+    query = query.strip().lower()
+    terms = query.split()
+    if texts is None:
+        texts = [project_search_text(p) for p in projects]
+    matches = [p for p, text in zip(projects, texts) if all(term in text for term in terms)]
+    if query:
+        matches.sort(key=lambda p: not str(p.get('name', '')).lower().startswith(query))
+    return matches[:limit] if limit else matches
+
+
+class ProjectIndex:
+    """ 離線專案索引(與清單快取同一個 SQLite 檔案),供輸入時即時搜尋
+        - sync_project_index 依上次同步時間只查詢新建立的專案(createdInLastHours),
+          超過 INDEX_FULL_SYNC_SECONDS 時完整重新同步,以更新修改與刪除的專案
+        - 搜尋在記憶體中進行,不需連線;不同帳號的索引分開存放
+        與 ListingCache 相同,SQLite 檔案在第一次使用時才建立
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.account = ""
+        self.lock = threading.Lock()
+        self._conn = None
+        self._disabled = False
+        self._loaded = {}  # 帳號 → (依建立日期降冪排序的專案清單, 對應的 project_search_text)
+
+    def _connect(self):
+        """ 回傳 SQLite 連線(第一次呼叫時開啟並建立資料表),無法使用時回傳 None(需持有 lock) """
+        if self._conn is None and not self._disabled:
+            try:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS project_index ("
+                    " account TEXT, uid TEXT, date_created TEXT, data TEXT, PRIMARY KEY (account, uid))")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS project_index_sync ("
+                    " account TEXT PRIMARY KEY, synced REAL, full_synced REAL)")
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                logging.error(f"Project index disabled: {type(e).__name__} - {str(e)}")
+                self._disabled = True
+        return self._conn
+
+    def sync_times(self):
+        """ 回傳 (上次同步時間, 上次完整同步時間),從未同步時為 (None, None) """
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return None, None
+            return self._sync_row(conn)
+
+    def _sync_row(self, conn):
+        row = conn.execute("SELECT synced, full_synced FROM project_index_sync WHERE account = ?",
+                           (self.account,)).fetchone()
+        return row or (None, None)
+
+    def store(self, projects, synced, full=False):
+        """ 寫入專案(相同 uid 覆寫);full=True 時先刪除索引中所有專案 """
+        try:
+            with self.lock:
+                conn = self._connect()
+                if conn is None:
+                    raise PhraseError("專案索引無法使用")
+                if full:
+                    conn.execute("DELETE FROM project_index WHERE account = ?", (self.account,))
+                conn.executemany("INSERT OR REPLACE INTO project_index VALUES (?, ?, ?, ?)",
+                                 [(self.account, p['uid'], p.get('dateCreated', ''), json.dumps(p))
+                                  for p in projects])
+                full_synced = synced if full else self._sync_row(conn)[1]
+                conn.execute("INSERT OR REPLACE INTO project_index_sync VALUES (?, ?, ?)",
+                             (self.account, synced, full_synced))
+                conn.commit()
+                self._loaded.pop(self.account, None)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to write project index: {type(e).__name__} - {str(e)}")
+            raise PhraseError(f"無法寫入專案索引: {str(e)}")
+
+    def _load(self):
+        """ 第一次使用時從 SQLite 載入記憶體,並預先計算搜尋用的比對文字 """
+        account = self.account
+        loaded = self._loaded.get(account)
+        if loaded is None:
+            projects = []
+            with self.lock:
+                conn = self._connect()
+                if conn is not None:
+                    rows = conn.execute(
+                        "SELECT data FROM project_index WHERE account = ? ORDER BY date_created DESC",
+                        (account,)).fetchall()
+                    projects = [json.loads(row[0]) for row in rows]
+            loaded = self._loaded[account] = (projects, [project_search_text(p) for p in projects])
+        return loaded
+
+    def projects(self):
+        """ 索引中的所有專案(依建立日期降冪) """
+        return self._load()[0]
+
+    def search(self, query="", limit=INDEX_SEARCH_LIMIT):
+        projects, texts = self._load()
+        return filter_projects(projects, query, limit, texts)
+
+    def clear(self):
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            conn.execute("DELETE FROM project_index")
+            conn.execute("DELETE FROM project_index_sync")
+            conn.commit()
+            self._loaded.clear()
+
+
+PROJECT_INDEX = ProjectIndex(CACHE_FILE)
+
+
+def save_credentials(username, token, expires):
+    """ 儲存帳號、token 和過期時間到檔案(不儲存密碼) """
+    try:
+        credentials = {
+            "username": username,
+            "token": token,
+            "expires": expires
+        }
+        with open(CREDENTIALS_FILE, 'w') as f:
+            json.dump(credentials, f)
+        logging.info("Credentials saved to file")
+    except Exception as e:
+        logging.error(f"Failed to save credentials: {type(e).__name__} - {str(e)}")
+        raise PhraseError(f"無法儲存憑證: {str(e)}")
+
+
+def load_credentials():
+    """ 從檔案載入帳號、token 和過期時間(不載入密碼) """
+    try:
+        if os.path.exists(CREDENTIALS_FILE):
+            with open(CREDENTIALS_FILE, 'r') as f:
+                credentials = json.load(f)
+            return credentials
+    except (json.JSONDecodeError, IOError) as e:
+        logging.error(f"Failed to load credentials: {type(e).__name__} - {str(e)}")
+    return None
+
+
+def is_token_valid(expires):
+    """ 檢查 token 是否過期 """
+    if not expires:
+        return False
+    try:
+        expire_time = datetime.fromisoformat(expires.replace('Z', '+00:00'))
+        current_time = datetime.now(timezone.utc)
+        return current_time < expire_time
+    except ValueError:
+        return False
+
+
+def clear_credentials():
+    """ 刪除儲存的憑證檔案 """
+    try:
+        if os.path.exists(CREDENTIALS_FILE):
+            os.remove(CREDENTIALS_FILE)
+        key_file = os.path.join(BASE_DIR, "key.key")
+        if os.path.exists(key_file):
+            os.remove(key_file)
+        logging.info("Credentials cleared")
+    except Exception as e:
+        logging.error(f"Failed to clear credentials: {type(e).__name__} - {str(e)}")
+        raise PhraseError(f"無法清除憑證: {str(e)}")
+
+
+def activate_token(username, token):
+    """ 設定目前使用的 token(CLIENT 的認證標頭與清單快取的帳號) """
+    CLIENT.set_token(token)
+    LISTING_CACHE.account = username
+    PROJECT_INDEX.account = username
+
+
+def login(username, password):
+    """ 使用帳號和密碼登入 Phrase TMS API,取得 token 並儲存憑證,回傳 API 的回應內容 """
+    payload = {
+        "userName": username,
+        "password": password
+    }
+    try:
+        response = CLIENT.post("/api2/v1/auth/login", json=payload)
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as http_err:
+        logging.error(f"Login failed: {http_err}")
+        raise PhraseError("登入失敗: 帳號密碼錯誤或帳號未啟用")
+    except requests.exceptions.RequestException as req_err:
+        logging.error(f"Login failed: {req_err}")
+        raise PhraseError(f"網路錯誤: {req_err}")
+    data = response.json()
+    activate_token(username, data["token"])
+    logging.info(f"Login successful for user: {username}")
+    save_credentials(username, data["token"], data["expires"])
+    return data
+
+
+def restore_session():
+    """ 載入儲存的憑證;token 尚未過期時直接啟用。回傳憑證內容(沒有則回傳 None) """
+    credentials = load_credentials()
+    if credentials:
+        # 未登入時也能搜尋該帳號的離線專案索引
+        PROJECT_INDEX.account = credentials.get("username", "")
+    if credentials and credentials.get("token") and is_token_valid(credentials.get("expires")):
+        activate_token(credentials["username"], credentials["token"])
+        logging.info(f"Using stored token for user: {credentials['username']}")
+    return credentials
+
+
+def handle_token_expired():
+    """ Token 過期時清除登入狀態並呼叫 token_expired_listeners(可由任何執行緒呼叫,只處理一次) """
+    with token_lock:
+        if CLIENT.token is None:  # 其他執行緒已處理過
+            return
+        CLIENT.clear_token()
+    logging.warning("Token expired")
+    for listener in token_expired_listeners:
+        listener()
+
+
+def list_projects(project_name=None, client_name=None, created_in_last_hours=None):
+    """查詢包含指定條件的所有專案(自動抓取所有分頁),並取得 targetLangs"""
+    params = {}
+    if project_name:
+        params["name"] = project_name
+    if client_name:
+        params["clientName"] = client_name
+    if created_in_last_hours:
+        params["createdInLastHours"] = created_in_last_hours
+
+    try:
+        projects_all = CLIENT.get_all_pages("/api2/v1/projects", params)
+    except requests.exceptions.HTTPError as http_err:
+        if http_err.response.status_code == 401:
+            handle_token_expired()
+            raise TokenExpiredError()
+        raise PhraseError(f"Failed to list projects: {http_err}")
+    except requests.exceptions.RequestException as e:
+        raise PhraseError(f"Failed to list projects: {e}")
+
+    # 確保 targetLangs 資訊被保留
+    for project in projects_all:
+        if 'targetLangs' not in project:
+            project['targetLangs'] = []
+    return projects_all
+
+
+def list_jobs(project_uid, workflowLevel=None, targetLang=None):
+    """ 抓取指定 project 的 jobs,可依 workflowLevel 和 targetLang 篩選
+        如果 workflowLevel=None,則抓取所有 jobs
+        如果 targetLang 有指定,則只回傳該語系的 jobs
+    """
+    return [job for page in iter_job_pages(project_uid, workflowLevel, targetLang) for job in page]
+
+
+def iter_job_pages(project_uid, workflowLevel=None, targetLang=None):
+    """ 與 list_jobs 相同,但每抓到一頁就產生該頁的 jobs """
+    params = {}
+    if workflowLevel:
+        params["workflowLevel"] = workflowLevel
+    if targetLang:
+        params["targetLang"] = targetLang
+    try:
+        yield from CLIENT.iter_pages(f"/api2/v1/projects/{project_uid}/jobs", params)
+    except requests.exceptions.HTTPError as http_err:
+        if http_err.response.status_code == 401:
+            handle_token_expired()
+            raise TokenExpiredError()
+        raise PhraseError(f"Failed to list jobs: {http_err}")
+    except requests.exceptions.RequestException as e:
+        raise PhraseError(f"Failed to list jobs: {e}")
+
+
+@contextlib.contextmanager
+def atomic_output(save_path):
+    """ 開啟同目錄下的暫存檔供寫入,完整寫入後才更名為 save_path,中斷時不會留下不完整的檔案
+        save_path 以 .gz 結尾時,寫入的資料以 gzip 壓縮
+    """
+    directory, filename = os.path.split(save_path)
+    fd, temp_path = tempfile.mkstemp(dir=directory or ".", prefix=f".{filename}.", suffix=".part")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if save_path.endswith(GZIP_SUFFIX):
+                with gzip.GzipFile(filename=filename[:-len(GZIP_SUFFIX)], mode='wb', fileobj=f) as gz:
+                    yield gz
+            else:
+                yield f
+        os.replace(temp_path, save_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_stream_atomic(chunks, save_path, cancel_event=None, open_output=atomic_output):
+    """ 將資料區塊逐塊寫入 save_path(透過 open_output);cancel_event 設定時中止並捨棄暫存檔 """
+    with open_output(save_path) as f:
+        for chunk in chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelled()
+            if chunk:
+                f.write(chunk)
+
+
+XLIFF_ROOT_START = re.compile(rb"<xliff\b(?:[^>\"']|\"[^\"]*\"|'[^']*')*>")
+
+
+def _mxliff_body_range(f):
+    """ 回傳 MXLIFF 檔案中根元素內容(所有 <file> 元素,不含根元素開始標籤後的空白)的 (開始, 結束) 位元組位置 """
+    head = f.read(MXLIFF_SCAN_SIZE)
+    match = XLIFF_ROOT_START.search(head)
+    if match is not None:
+        whitespace = len(head[match.end():]) - len(head[match.end():].lstrip())
+    size = f.seek(0, os.SEEK_END)
+    tail_start = max(size - MXLIFF_SCAN_SIZE, 0)
+    f.seek(tail_start)
+    end = f.read().rfind(b"</xliff")
+    if match is None or end < 0:
+        raise PhraseError(f"不是有效的 MXLIFF 檔案: {getattr(f, 'name', '')}")
+    return match.end() + whitespace, tail_start + end
+
+
+def _copy_range(src, dst, start, end):
+    src.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        block = src.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+        if not block:
+            break
+        dst.write(block)
+        remaining -= len(block)
+
+
+def merge_mxliff_files(part_paths, save_path, open_output=atomic_output):
+    """ 將分段下載的 MXLIFF 依序合併為一個檔案(透過 open_output):保留第一段的 XML 宣告與 <xliff> 根元素,
+        依序串接每一段的 <file> 元素;逐區塊複製,記憶體用量與檔案大小無關
+    """
+    with open_output(save_path) as out:
+        for index, part_path in enumerate(part_paths):
+            with open(part_path, 'rb') as part:
+                start, end = _mxliff_body_range(part)
+                _copy_range(part, out, 0 if index == 0 else start, end)
+                if index == len(part_paths) - 1:
+                    part.seek(end)
+                    out.write(part.read())
+
+
+def download_bilingual_file(project_uid, job_uids, save_path, cancel_event=None, open_output=atomic_output,
+                            client=CLIENT):
+    """ 下載雙語檔案(client 預設為登入的 CLIENT,帳號池時為其中一個 AccountClient) """
+    # 建立 payload
+    jobs_list = [{"uid": uid} for uid in job_uids]
+    payload = {"jobs": jobs_list}
+
+    try:
+        with client.stream("POST", f"/api2/v1/projects/{project_uid}/jobs/bilingualFile",
+                           json=payload) as response:
+            response.raise_for_status()
+            write_stream_atomic(response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE), save_path, cancel_event,
+                                open_output)
+
+        return f"成功下載到: {save_path}"
+    except DownloadCancelled:
+        return "已取消"
+    except requests.exceptions.HTTPError as http_err:
+        return f"HTTP error: {http_err}"
+    except requests.exceptions.RequestException as req_err:
+        return f"Request error: {req_err}"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+class FilenameAllocator:
+    """ 執行緒安全的檔名分配:檔名重複時自動加上編號 (1), (2), (3)...
+        每個目錄第一次使用時掃描一次既有檔案(scan=False 時從空白開始),之後只查詢記憶體中的保留清單;
+        同一個檔名的下一個編號會被記住,大量重複檔名時每次分配仍為 O(1)
+        名稱比較使用 os.path.normcase,在不分大小寫的檔案系統(Windows)上不會產生只差大小寫的檔名
+    """
+
+    def __init__(self, scan=True):
+        self.scan = scan
+        self._directories = {}  # 目錄 → (已使用的檔名, 各檔名下一個可用編號, 本次 allocate() 分配的檔名)
+        self._lock = threading.Lock()
+
+    def _directory(self, directory):
+        entry = self._directories.get(directory)
+        if entry is None:
+            names = set()
+            if self.scan and os.path.isdir(directory):
+                with os.scandir(directory) as it:
+                    names = {os.path.normcase(e.name) for e in it}
+            entry = self._directories[directory] = (names, {}, set())
+        return entry
+
+    @staticmethod
+    def _split(filename):
+        base_name, extension = os.path.splitext(filename)
+        if extension == GZIP_SUFFIX:
+            base_name, inner_extension = os.path.splitext(base_name)
+            extension = inner_extension + extension
+        return base_name, extension
+
+    def allocate(self, directory, filename):
+        """ 保留並回傳 directory 中尚未使用的檔名 """
+        with self._lock:
+            names, next_counter, allocated = self._directory(directory)
+            key = os.path.normcase(filename)
+            candidate = filename
+            if key in names:
+                base_name, extension = self._split(filename)
+                counter = next_counter.get(key, 1)
+                candidate = f"{base_name} ({counter}){extension}"
+                while os.path.normcase(candidate) in names:
+                    counter += 1
+                    candidate = f"{base_name} ({counter}){extension}"
+                next_counter[key] = counter + 1
+            names.add(os.path.normcase(candidate))
+            allocated.add(os.path.normcase(candidate))
+            return candidate
+
+    def reserve(self, directory, filename):
+        """ 保留指定的檔名(例如要覆寫的既有檔案),之後分配的檔名不會與它重複 """
+        with self._lock:
+            names, _, allocated = self._directory(directory)
+            names.add(os.path.normcase(filename))
+            allocated.discard(os.path.normcase(filename))
+
+    def release(self, directory, filename):
+        """ 寫入失敗時釋放保留的檔名;只釋放本次由 allocate() 分配的檔名,
+            掃描到的既有檔案與 reserve() 保留(要覆寫)的檔名仍維持保留
+        """
+        with self._lock:
+            names, _, allocated = self._directory(directory)
+            key = os.path.normcase(filename)
+            if key in allocated:
+                allocated.discard(key)
+                names.discard(key)
+
+
+class DirectoryOutput:
+    """ 下載檔案的輸出目標:直接寫入各語系資料夾(預設)
+        檔名由 FilenameAllocator 分配,每次執行建立一個新的 DirectoryOutput,保留清單只在該次執行有效
+    """
+
+    def __init__(self):
+        self.allocator = FilenameAllocator()
+
+    def prepare_folder(self, folder):
+        os.makedirs(folder, exist_ok=True)
+
+    def allocate(self, folder, filename, overwrite=False):
+        """ 回傳檔案的儲存路徑;overwrite=False 時檔名重複會加上編號 """
+        if not overwrite:
+            filename = self.allocator.allocate(folder, filename)
+        return os.path.join(folder, filename)
+
+    def reserve(self, folder, filename):
+        self.allocator.reserve(folder, filename)
+
+    @contextlib.contextmanager
+    def open(self, save_path):
+        try:
+            with atomic_output(save_path) as f:
+                yield f
+        except BaseException:
+            self.allocator.release(*os.path.split(save_path))
+            raise
+
+    def close(self):
+        pass
+
+
+DIRECTORY_OUTPUT = DirectoryOutput()  # 分段暫存檔等固定檔名(overwrite=True)的寫入
+
+
+class ZipOutput:
+    """ 下載檔案的輸出目標:所有檔案寫入同一個 ZIP,資料夾與檔名規則與 DirectoryOutput 相同
+        下載執行緒將內容寫到 SpooledTemporaryFile,完成後交給唯一的寫入執行緒依序加入 ZIP,
+        磁碟上只有一個循序寫入的檔案;ZIP 在 close() 後才以正式檔名出現
+    """
+
+    def __init__(self, zip_path, save_dir, max_in_flight=MAX_WORKERS):
+        self.zip_path = zip_path
+        self.save_dir = save_dir
+        # 同時存在的暫存最多為下載中 + 等待寫入的檔案數,依此分配 ZIP_SPOOL_BUDGET
+        self._spool_size = max(ZIP_SPOOL_MIN_SIZE, ZIP_SPOOL_BUDGET // (max_in_flight + ZIP_QUEUE_SIZE))
+        self.allocator = FilenameAllocator(scan=False)
+        self._queue = queue.Queue(maxsize=ZIP_QUEUE_SIZE)
+        self._error = None
+        os.makedirs(os.path.dirname(zip_path) or ".", exist_ok=True)
+        fd, self._temp_path = tempfile.mkstemp(dir=os.path.dirname(zip_path) or ".",
+                                               prefix=f".{os.path.basename(zip_path)}.", suffix=".part")
+        self._file = os.fdopen(fd, 'wb')
+        self._zip = zipfile.ZipFile(self._file, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._writer = threading.Thread(target=self._write_entries, name="zip-writer", daemon=True)
+        self._writer.start()
+
+    def prepare_folder(self, folder):
+        pass
+
+    def allocate(self, folder, filename, overwrite=False):
+        """ 保留 ZIP 內的檔名(與 DirectoryOutput 相同的編號規則),回傳 zip 路徑/檔名 形式的路徑 """
+        arc_folder = os.path.relpath(folder, self.save_dir)
+        return os.path.join(self.zip_path, arc_folder, self.allocator.allocate(arc_folder, filename))
+
+    def _arcname(self, save_path):
+        return os.path.relpath(save_path, self.zip_path).replace(os.sep, "/")
+
+    @contextlib.contextmanager
+    def open(self, save_path):
+        spool = tempfile.SpooledTemporaryFile(max_size=self._spool_size)
+        try:
+            yield spool
+        except BaseException:
+            spool.close()
+            arc_folder, filename = os.path.split(os.path.relpath(save_path, self.zip_path))
+            self.allocator.release(arc_folder, filename)
+            raise
+        if self._error is not None:
+            spool.close()
+            raise self._error
+        spool.seek(0)
+        self._queue.put((self._arcname(save_path), spool))
+
+    def _write_entries(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            arcname, spool = item
+            try:
+                if self._error is None:
+                    with self._zip.open(arcname, 'w', force_zip64=True) as entry:
+                        shutil.copyfileobj(spool, entry, DOWNLOAD_CHUNK_SIZE)
+            except Exception as e:
+                logging.error(f"Failed to write {arcname} to {self.zip_path}: {type(e).__name__} - {str(e)}")
+                self._error = e
+            finally:
+                spool.close()
+
+    def close(self):
+        """ 等待所有檔案寫入後關閉 ZIP 並更名為正式檔名 """
+        self._queue.put(None)
+        self._writer.join()
+        self._zip.close()
+        self._file.close()
+        if self._error is not None:
+            os.remove(self._temp_path)
+            raise PhraseError(f"無法寫入 ZIP: {self._error}")
+        os.replace(self._temp_path, self.zip_path)
+
+
+class DownloadManifest:
+    """ 記錄輸出目錄中每個已下載項目的指紋與檔案路徑(存於 .phrase_manifest.json),
+        重新執行時只下載新增或變更的 jobs,變更的檔案直接覆寫原路徑
+    """
+    FILENAME = ".phrase_manifest.json"
+
+    def __init__(self, save_dir):
+        self.save_dir = save_dir
+        self.path = os.path.join(save_dir, self.FILENAME)
+        self.entries = {}
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error(f"Failed to load download manifest: {type(e).__name__} - {str(e)}")
+
+    def plan(self, key, fingerprint):
+        """ 回傳 ("skip" | "overwrite" | "new", 已記錄的完整路徑或 None) """
+        entry = self.entries.get(key)
+        if entry is None:
+            return "new", None
+        path = os.path.join(self.save_dir, entry["path"])
+        if entry["fingerprint"] == fingerprint and os.path.exists(path):
+            return "skip", path
+        return "overwrite", path
+
+    def record(self, key, fingerprint, path):
+        self.entries[key] = {
+            "fingerprint": fingerprint,
+            "path": os.path.relpath(path, self.save_dir),
+            "downloaded": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def save(self):
+        try:
+            with atomic_output(self.path) as f:
+                f.write(json.dumps(self.entries, ensure_ascii=False, indent=1).encode('utf-8'))
+        except OSError as e:
+            logging.error(f"Failed to save download manifest: {type(e).__name__} - {str(e)}")
+
+
+class StatusJournal:
+    """ 批量更新狀態的只附加記錄(JSONL,存於 JOURNAL_DIR):每個更新成功的 job 寫入一行
+        只有中斷(token 過期或取消)的執行會保留記錄;相同的專案、工作流程與目標狀態重新執行時,
+        記錄中且目前狀態已是目標狀態的 jobs 算作先前已完成,其餘照常送出
+        最後一筆記錄超過 JOURNAL_MAX_AGE_SECONDS 的記錄視為過期並刪除;寫入失敗只記錄錯誤,不影響更新本身
+    """
+
+    def __init__(self, projects, workflow_name, status, directory=None):
+        key = json.dumps([sorted(p['uid'] for p in projects), workflow_name, status])
+        self.path = os.path.join(directory or JOURNAL_DIR,
+                                 f"status_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.jsonl")
+        self.completed = set()
+        self._file = None
+        last_recorded = 0.0
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                            self.completed.add(record["job_uid"])
+                            last_recorded = max(last_recorded, record.get("time", 0.0))
+                        except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+                            continue  # 中斷時寫了一半的行
+        except IOError as e:
+            logging.error(f"Failed to load status journal: {type(e).__name__} - {str(e)}")
+        if self.completed and time.time() - last_recorded > JOURNAL_MAX_AGE_SECONDS:
+            logging.info(f"Status journal expired, discarding: {self.path}")
+            self.discard()
+
+    def record(self, job_uid):
+        self.completed.add(job_uid)
+        try:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(json.dumps({"job_uid": job_uid, "time": time.time()}) + "\n")
+            self._file.flush()
+        except OSError as e:
+            logging.error(f"Failed to write status journal: {type(e).__name__} - {str(e)}")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """ 關閉並刪除記錄(作業已全部完成或使用者選擇重新開始) """
+        self.close()
+        self.completed.clear()
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except OSError as e:
+            logging.error(f"Failed to remove status journal: {type(e).__name__} - {str(e)}")
+
+
+def job_fingerprint(jobs):
+    """ 以 list_jobs 回傳的 job 資料(含 status 與各項日期)計算指紋,任何欄位變更都會改變指紋 """
+    data = json.dumps(sorted(jobs, key=lambda job: job['uid']), sort_keys=True)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def discard_log(text):
+    """ 預設的 log 回呼:不輸出進度(仍會寫入 logging) """
+
+
+def resolve_workflow(project, workflow_name):
+    """ 回傳 (workflow level, workflow 縮寫);NO_WORKFLOW 回傳 (None, ""),找不到工作流程時拋出 PhraseError """
+    if workflow_name == NO_WORKFLOW:
+        return None, ""
+    if not workflow_name:
+        raise PhraseError("請輸入工作流程名稱")
+    workflow_steps = project.get("workflowSteps", [])
+    workflow_info = next((w for w in workflow_steps if w["name"] == workflow_name), None)
+    if workflow_info is None:
+        raise PhraseError(f"Workflow {workflow_name} not found in project {project['name']}")
+    return workflow_info["workflowLevel"], workflow_info.get("abbreviation", "")
+
+
+def update_job_status(project_uid, job_uid, status, client=CLIENT):
+    """ 修改單一 job 的 status(重試機制由 client 的連線層負責) """
+    payload = {
+        "requestedStatus": status,
+        "notifyOwner": True,
+        "propagateStatus": True
+    }
+    if client.token is None:  # 其他請求已遇到 token 過期,不再送出
+        return TokenExpiredError.MESSAGE
+    try:
+        response = client.post(f"/api2/v1/projects/{project_uid}/jobs/{job_uid}/setStatus", json=payload)
+        response.raise_for_status()
+        return STATUS_UPDATED
+    except requests.exceptions.HTTPError as http_err:
+        if http_err.response.status_code == 401:
+            if client is not CLIENT:
+                # 帳號池的帳號已自動重新登入過一次仍失敗:只算這個 job 失敗,與登入的 CLIENT 無關
+                return f"帳號 {client.username} 認證失敗"
+            handle_token_expired()
+            return TokenExpiredError.MESSAGE
+        return f"HTTP error: {http_err} - Response: {response.text if 'response' in locals() else 'No response'}"
+    except requests.exceptions.RequestException as req_err:
+        return f"Request error: {req_err}"
+
+
+class BaseEngine:
+    """ 傳輸引擎的共用部分:清單查詢先經過 LISTING_CACHE,未命中時才呼叫子類別的 fetch_* 方法 """
+
+    def ceiling(self, endpoint):
+        """ 此引擎對該端點可同時進行的請求數(流程據此設定 download_files / update_statuses 的 max_workers) """
+        return LIMITER.ceiling(endpoint)
+
+    def list_projects(self, project_name=None, client_name=None):
+        return LISTING_CACHE.get_or_fetch(
+            "projects", [project_name, client_name],
+            lambda: self.fetch_projects(project_name=project_name, client_name=client_name))
+
+    def list_jobs(self, project_uid, workflowLevel=None, targetLang=None):
+        return LISTING_CACHE.get_or_fetch(
+            "jobs", [project_uid, workflowLevel, targetLang],
+            lambda: self.fetch_jobs(project_uid, workflowLevel=workflowLevel, targetLang=targetLang),
+            project_uid=project_uid)
+
+    def iter_job_pages(self, project_uid, workflowLevel=None, targetLang=None, fresh=False):
+        """ 依序產生 job 清單的每一頁;快取命中時一次產生整份清單,
+            否則每抓到一頁就產生,全部抓完後才寫入快取(中途停止時不寫入)
+            fresh=True 時不使用快取,一定重新查詢(結果仍寫入快取)
+        """
+        key = [project_uid, workflowLevel, targetLang]
+        jobs = None if fresh else LISTING_CACHE.get("jobs", key)
+        if jobs is not None:
+            yield jobs
+            return
+        jobs = []
+        for page in self.fetch_job_pages(project_uid, workflowLevel=workflowLevel, targetLang=targetLang):
+            jobs.extend(page)
+            yield page
+        LISTING_CACHE.put("jobs", key, jobs, project_uid=project_uid)
+
+
+class ThreadEngine(BaseEngine):
+    """ 以執行緒池搭配共用 CLIENT 執行 API 請求(預設引擎) """
+    name = "threads"
+
+    def fetch_projects(self, project_name=None, client_name=None, created_in_last_hours=None):
+        return list_projects(project_name=project_name, client_name=client_name,
+                             created_in_last_hours=created_in_last_hours)
+
+    def fetch_jobs(self, project_uid, workflowLevel=None, targetLang=None):
+        return list_jobs(project_uid, workflowLevel=workflowLevel, targetLang=targetLang)
+
+    def fetch_job_pages(self, project_uid, workflowLevel=None, targetLang=None):
+        return iter_job_pages(project_uid, workflowLevel=workflowLevel, targetLang=targetLang)
+
+    def ceiling(self, endpoint):
+        # 執行緒數超過連線池大小時只會等待可用連線
+        return min(LIMITER.ceiling(endpoint), MAX_WORKERS)
+
+    def job_client(self):
+        """ 下一個 job 請求使用的連線(帳號池引擎依序輪流使用各帳號) """
+        return CLIENT
+
+    @staticmethod
+    def _run_all(func, items, max_workers, cancel_event):
+        """ 以同一個執行緒池執行 func(*item[1:]),維持最多 max_workers 個進行中的請求,
+            每完成一個就從 items(可為 generator)取出下一個補上;依完成順序產生 (item[0], 結果)
+            cancel_event 設定後不再送出新工作,只等待進行中的請求結束
+        """
+        items = iter(items)
+        in_flight = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                while len(in_flight) < max_workers and not (cancel_event is not None and cancel_event.is_set()):
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    in_flight[executor.submit(func, *item[1:])] = item[0]
+                if not in_flight:
+                    return
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+
+    def download_files(self, downloads, max_workers, cancel_event=None):
+        """ downloads 為 (key, project_uid, job_uids, folder, filename[, overwrite[, output]]) 的清單,
+            依完成順序產生 (key, 最終檔名, 結果訊息);overwrite=True 時直接覆寫既有檔案,
+            output 為輸出目標(預設 DIRECTORY_OUTPUT)
+        """
+        def download_one(project_uid, job_uids, folder, filename, overwrite=False, output=DIRECTORY_OUTPUT):
+            try:
+                # 檢查檔名是否重複，如果重複則加上編號
+                save_path = output.allocate(folder, filename, overwrite)
+                filename = os.path.basename(save_path)
+                return filename, download_bilingual_file(project_uid, job_uids, save_path, cancel_event,
+                                                         output.open, self.job_client())
+            except Exception as e:
+                return filename, f"Error: {str(e)}"
+
+        for key, (filename, result) in self._run_all(download_one, downloads, max_workers, cancel_event):
+            yield key, filename, result
+
+    def update_statuses(self, updates, max_workers, cancel_event=None):
+        """ updates 為 (key, project_uid, job_uid, status) 的清單,依完成順序產生 (key, 結果訊息) """
+        def update_one(project_uid, job_uid, status):
+            try:
+                return update_job_status(project_uid, job_uid, status, self.job_client())
+            except Exception as e:
+                return f"Error: {str(e)}"
+
+        return self._run_all(update_one, updates, max_workers, cancel_event)
+
+
+class AsyncEngine(BaseEngine):
+    """ 以 asyncio + httpx 執行 API 請求:單一事件迴圈執行緒即可同時處理數百個請求,
+        安裝 h2 時使用 HTTP/2 多工。回傳結果與 ThreadEngine 相同
+    """
+    name = "asyncio"
+
+    def __init__(self, client, max_in_flight=ASYNC_MAX_IN_FLIGHT, retries=3, backoff_factor=1):
+        if httpx is None:
+            raise PhraseError("asyncio 引擎需要安裝 httpx (pip install httpx)")
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._http = None
+        # 檔案寫入(包含 ZipOutput 佇列已滿時的等待)交給獨立的執行緒池,不阻塞事件迴圈上的其他請求
+        self._file_executor = concurrent.futures.ThreadPoolExecutor(max_workers=ASYNC_FILE_WORKERS,
+                                                                    thread_name_prefix="phrase-file")
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="phrase-asyncio", daemon=True).start()
+
+    def _run(self, coro):
+        """ 在事件迴圈執行緒上執行 coroutine 並等待結果 """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _iter_results(self, coro_fns, cancel_event=None):
+        """ 在事件迴圈上執行 coroutine,維持最多 max_in_flight 個進行中的請求,每完成一個就從
+            coro_fns(可為 generator)取出下一個補上;依完成順序產生結果
+            cancel_event 設定後不再送出新請求,只等待進行中的請求結束
+        """
+        coro_fns = iter(coro_fns)
+        finished = queue.Queue()
+        in_flight = 0
+        while True:
+            while in_flight < self.max_in_flight and not (cancel_event is not None and cancel_event.is_set()):
+                coro_fn = next(coro_fns, None)
+                if coro_fn is None:
+                    break
+                future = asyncio.run_coroutine_threadsafe(coro_fn(), self._loop)
+                future.add_done_callback(finished.put)
+                in_flight += 1
+            if not in_flight:
+                return
+            future = finished.get()
+            in_flight -= 1
+            yield future.result()
+
+    def _http_client(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.client.base_url,
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(max_connections=self.max_in_flight,
+                                    max_keepalive_connections=self.max_in_flight),
+                timeout=httpx.Timeout(REQUEST_TIMEOUT),
+            )
+        return self._http
+
+    async def _send(self, method, path, stream=False, **kwargs):
+        """ 經共用限流器送出請求,遇到 429/5xx 時重試(與 PhraseClient._send 相同);
+            stream=True 時回傳的 response 仍占用限流配額,呼叫端需在讀完內容後呼叫 limiter.release
+            與 response.phrase_timing.finish
+        """
+        http = self._http_client()
+        limiter = self.client.limiter
+        endpoint = endpoint_name(path)
+        headers = {"Content-Type": "application/json", "Accept-Encoding": ACCEPT_ENCODING}
+        if self.client.token:
+            headers["Authorization"] = f"ApiToken {self.client.token}"
+        timing = RequestTiming(endpoint)
+        for attempt in range(self.retries + 1):
+            wait_started = time.monotonic()
+            await limiter.acquire_async(endpoint)
+            timing.acquired(wait_started)
+            try:
+                request = http.build_request(method, path, headers=headers, **kwargs)
+                response = await http.send(request, stream=stream)
+            except BaseException:
+                limiter.release(endpoint)
+                timing.responded(None, attempt)
+                timing.finish("error", 0)
+                raise
+            timing.responded(response.status_code, attempt)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            limiter.feedback(endpoint, response.status_code, retry_after)
+            self.client.check_encoding(endpoint, response.headers)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                response.phrase_timing = timing
+                if not stream:
+                    limiter.release(endpoint)
+                    timing.finish(response.status_code, response.num_bytes_downloaded)
+                return response
+            await response.aclose()
+            limiter.release(endpoint)
+            if response.status_code not in THROTTLE_STATUS_CODES or retry_after is None:
+                # 附 Retry-After 的 429/503 由限流器的暫停負責,其他情況只有這個請求以指數退避等待
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    @staticmethod
+    def _http_error(response):
+        """ 產生與 requests.HTTPError 相同格式的錯誤訊息 """
+        kind = "Client" if response.status_code < 500 else "Server"
+        return f"{response.status_code} {kind} Error: {response.reason_phrase} for url: {response.url}"
+
+    async def _fetch_page(self, path, params, page):
+        response = await self._send("GET", path, params={**params, "pageNumber": page})
+        if response.is_error:
+            raise AsyncHTTPError(response)
+        return response.json()
+
+    def _iter_pages(self, path, params, what):
+        """ 依頁碼順序產生每一頁的 content:先取第一頁得知 totalPages,其餘頁面最多 PAGE_FETCH_WORKERS 頁同時抓取,
+            每抓到一頁就回傳(與 PhraseClient.iter_pages 相同)
+        """
+        params = {**params, "pageSize": MAX_PAGE_SIZE}
+        pending = collections.deque()
+        try:
+            first = self._run(self._fetch_page(path, params, 0))
+            yield first.get("content", [])
+            pages = iter(range(1, first.get("totalPages", 1)))
+            for page in pages:
+                pending.append(asyncio.run_coroutine_threadsafe(self._fetch_page(path, params, page), self._loop))
+                if len(pending) < PAGE_FETCH_WORKERS:
+                    continue
+                yield pending.popleft().result().get("content", [])
+            while pending:
+                yield pending.popleft().result().get("content", [])
+        except AsyncHTTPError as http_err:
+            if http_err.response.status_code == 401:
+                handle_token_expired()
+                raise TokenExpiredError()
+            raise PhraseError(f"Failed to list {what}: {self._http_error(http_err.response)}")
+        except httpx.HTTPError as e:
+            raise PhraseError(f"Failed to list {what}: {e}")
+        finally:
+            # 中途停止或失敗時,不再等待尚未完成的頁面
+            for future in pending:
+                future.cancel()
+
+    def _list(self, path, params, what):
+        return [item for page in self._iter_pages(path, params, what) for item in page]
+
+    def fetch_projects(self, project_name=None, client_name=None, created_in_last_hours=None):
+        params = {}
+        if project_name:
+            params["name"] = project_name
+        if client_name:
+            params["clientName"] = client_name
+        if created_in_last_hours:
+            params["createdInLastHours"] = created_in_last_hours
+        projects_all = self._list("/api2/v1/projects", params, "projects")
+        # 確保 targetLangs 資訊被保留
+        for project in projects_all:
+            if 'targetLangs' not in project:
+                project['targetLangs'] = []
+        return projects_all
+
+    def fetch_jobs(self, project_uid, workflowLevel=None, targetLang=None):
+        return [job for page in self.fetch_job_pages(project_uid, workflowLevel, targetLang) for job in page]
+
+    def fetch_job_pages(self, project_uid, workflowLevel=None, targetLang=None):
+        params = {}
+        if workflowLevel:
+            params["workflowLevel"] = workflowLevel
+        if targetLang:
+            params["targetLang"] = targetLang
+        return self._iter_pages(f"/api2/v1/projects/{project_uid}/jobs", params, "jobs")
+
+    async def _download(self, key, project_uid, job_uids, folder, filename, overwrite=False, output=DIRECTORY_OUTPUT,
+                        cancel_event=None):
+        try:
+            # 檢查檔名是否重複，如果重複則加上編號
+            save_path = output.allocate(folder, filename, overwrite)
+        except Exception as e:
+            return key, filename, f"Error: {str(e)}"
+        filename = os.path.basename(save_path)
+        path = f"/api2/v1/projects/{project_uid}/jobs/bilingualFile"
+        payload = {"jobs": [{"uid": uid} for uid in job_uids]}
+        try:
+            response = await self._send("POST", path, stream=True, json=payload)
+            try:
+                if response.is_error:
+                    return key, filename, f"HTTP error: {self._http_error(response)}"
+                await self._write_response(response, output.open(save_path), cancel_event)
+            finally:
+                await response.aclose()
+                self.client.limiter.release(endpoint_name(path))
+                response.phrase_timing.finish(response.status_code, response.num_bytes_downloaded)
+            return key, filename, f"成功下載到: {save_path}"
+        except DownloadCancelled:
+            return key, filename, "已取消"
+        except httpx.HTTPError as req_err:
+            return key, filename, f"Request error: {req_err}"
+        except Exception as e:
+            return key, filename, f"Error: {str(e)}"
+
+    async def _in_file_thread(self, func, *args):
+        return await self._loop.run_in_executor(self._file_executor, func, *args)
+
+    async def _write_response(self, response, writer, cancel_event=None):
+        """ 將回應內容寫入 writer(output.open 回傳的 context manager);開啟、寫入與關閉都在 _file_executor 執行 """
+        f = await self._in_file_thread(writer.__enter__)
+        try:
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise DownloadCancelled()
+                await self._in_file_thread(f.write, chunk)
+        except BaseException as e:
+            if not await self._in_file_thread(writer.__exit__, type(e), e, e.__traceback__):
+                raise
+        else:
+            await self._in_file_thread(writer.__exit__, None, None, None)
+
+    def download_files(self, downloads, max_workers=None, cancel_event=None):
+        """ 與 ThreadEngine.download_files 相同;並行數由 max_in_flight 決定 """
+        return self._iter_results((functools.partial(self._download, *download, cancel_event=cancel_event)
+                                   for download in downloads), cancel_event)
+
+    async def _update_status(self, key, project_uid, job_uid, status):
+        payload = {
+            "requestedStatus": status,
+            "notifyOwner": True,
+            "propagateStatus": True
+        }
+        if self.client.token is None:  # 其他請求已遇到 token 過期,不再送出
+            return key, TokenExpiredError.MESSAGE
+        try:
+            response = await self._send("POST", f"/api2/v1/projects/{project_uid}/jobs/{job_uid}/setStatus",
+                                        json=payload)
+        except httpx.HTTPError as req_err:
+            return key, f"Request error: {req_err}"
+        except Exception as e:
+            return key, f"Error: {str(e)}"
+        if response.status_code == 401:
+            handle_token_expired()
+            return key, TokenExpiredError.MESSAGE
+        if response.is_error:
+            return key, f"HTTP error: {self._http_error(response)} - Response: {response.text}"
+        return key, STATUS_UPDATED
+
+    def update_statuses(self, updates, max_workers=None, cancel_event=None):
+        """ 與 ThreadEngine.update_statuses 相同;並行數由 max_in_flight 決定 """
+        return self._iter_results((functools.partial(self._update_status, *update) for update in updates),
+                                  cancel_event)
+
+
+class AsyncHTTPError(Exception):
+    """ AsyncEngine 分頁查詢收到錯誤狀態碼時使用,保留 response 供呼叫端判斷 """
+
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+class PoolEngine(ThreadEngine):
+    """ 帳號池引擎:清單查詢使用登入的 CLIENT,下載與狀態更新依序分配給 accounts.json 中的各服務帳號,
+        每個帳號有自己的限流器,同時請求數的上限隨帳號數增加
+    """
+    name = "pool"
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def ceiling(self, endpoint):
+        return sum(min(client.limiter.ceiling(endpoint), MAX_WORKERS) for client in self.pool.clients)
+
+    def job_client(self):
+        return self.pool.next_client()
+
+    def download_files(self, downloads, max_workers, cancel_event=None):
+        self.pool.login_all()
+        return super().download_files(downloads, max_workers, cancel_event)
+
+    def update_statuses(self, updates, max_workers, cancel_event=None):
+        self.pool.login_all()
+        return super().update_statuses(updates, max_workers, cancel_event)
+
+
+THREAD_ENGINE = ThreadEngine()
+_async_engine = None
+_pool_engine = None
+
+
+def get_engine(name=ThreadEngine.name):
+    """ 依名稱回傳傳輸引擎("threads"、"asyncio" 或 "pool");asyncio 與帳號池引擎在第一次使用時才建立,
+        未安裝 httpx 或帳號池沒有設定帳號時拋出 PhraseError(帳號在第一次下載或更新時才登入)
+    """
+    global _async_engine, _pool_engine
+    if name == AsyncEngine.name:
+        if _async_engine is None:
+            _async_engine = AsyncEngine(CLIENT)
+        return _async_engine
+    if name == PoolEngine.name:
+        if _pool_engine is None:
+            _pool_engine = PoolEngine(TokenPool(load_accounts()))
+        return _pool_engine
+    return THREAD_ENGINE
+
+
+def search_projects(engine, project_names=(), client_name=None):
+    """ 查詢專案,可同時使用多個專案名稱與客戶名稱條件
+        多個專案名稱平行查詢,以 uid 去除重複後依建立日期降冪排序
+    """
+    project_names = [name for name in project_names if name]
+    if not project_names and not client_name:
+        raise PhraseError("請輸入至少一個專案名稱或客戶名稱")
+
+    projects_all = []
+    seen_uids = set()
+
+    def add_projects(projects):
+        for p in projects:
+            if p['uid'] not in seen_uids:
+                seen_uids.add(p['uid'])
+                projects_all.append(p)
+
+    # 若有專案名稱,平行查詢,依完成順序合併
+    if project_names:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(SEARCH_WORKERS, len(project_names))) as executor:
+            futures = [executor.submit(engine.list_projects, project_name=project_name,
+                                       client_name=client_name or None)
+                       for project_name in project_names]
+            for future in concurrent.futures.as_completed(futures):
+                add_projects(future.result())
+    else:
+        # 若沒有專案名稱,但有客戶名稱
+        add_projects(engine.list_projects(client_name=client_name))
+
+    projects_all.sort(key=lambda x: x['dateCreated'], reverse=True)
+    return projects_all
+
+
+def sync_project_index(engine, full=False, log=None):
+    """ 同步 PROJECT_INDEX:距上次完整同步未超過 INDEX_FULL_SYNC_SECONDS 時只查詢上次同步後新建立的專案
+        (createdInLastHours 以小時為單位,多查一小時避免邊界遺漏),否則(或 full=True)重新列出所有專案
+        回傳 (本次取得的專案數, 索引中的專案總數)
+    """
+    log = log or discard_log
+    now = time.time()
+    synced, full_synced = PROJECT_INDEX.sync_times()
+    full = full or synced is None or full_synced is None or now - full_synced > INDEX_FULL_SYNC_SECONDS
+    if full:
+        log("完整同步專案索引...\n")
+        projects = engine.fetch_projects()
+    else:
+        projects = engine.fetch_projects(created_in_last_hours=int((now - synced) // 3600) + 2)
+    PROJECT_INDEX.store(projects, now, full=full)
+    total = len(PROJECT_INDEX.projects())
+    log(f"專案索引已同步:取得 {len(projects)} 個專案,共 {total} 個\n")
+    logging.info(f"Project index synced ({'full' if full else 'incremental'}): "
+                 f"{len(projects)} fetched, {total} indexed")
+    return len(projects), total
+
+
+def download_bilingual_files_by_language(engine, projects, target_langs, save_dir, download_mode=MODE_MERGED,
+                                         workflow_name=NO_WORKFLOW, incremental=True, log=None, cancel_event=None,
+                                         merge_chunk_size=None, compress=False, archive=False):
+    """ 下載選定專案、語言的雙語檔案,進度以 log(text) 回報,cancel_event 設定後停止處理
+        每個專案只列出一次 jobs(不依語言分別查詢),在本機依 targetLang 分到選定的語言
+        列出 jobs 與下載同時進行:列表執行緒每取得一頁 jobs(合併下載為每個專案、語言)就將下載工作放入
+        有上限的佇列(DOWNLOAD_QUEUE_SIZE),下載端從佇列取出,全部共用同一個排程,並行上限由 engine.ceiling("bilingualFile") 決定
+        incremental=True 時重新列出 jobs(不使用清單快取),依 DownloadManifest 跳過未變更的 jobs,變更的 jobs 覆寫原檔案
+        merge_chunk_size 有設定時,合併下載的 jobs 每 merge_chunk_size 個分成一段平行下載,全部完成後在本機合併
+        compress=True 時每個檔案以 gzip 壓縮寫入(.mxliff.gz),資料夾結構不變
+        archive=True 時所有檔案寫入 save_dir 下的單一 ZIP(ZipOutput),此時不使用 manifest,也不另外壓縮
+        結束時將本次的 API 效能統計寫入 REPORT_DIR(METRICS.write_report)
+        回傳 {"downloaded": 成功數, "failed": 失敗數, "skipped": 未變更而略過的數量[, "archive": ZIP 路徑]}
+    """
+    log = log or discard_log
+    cancel_event = cancel_event or threading.Event()
+    METRICS.begin_run("download")
+    summary = {"downloaded": 0, "failed": 0, "skipped": 0}
+    manifest = DownloadManifest(save_dir)
+    chunk_dir = None  # 分段暫存檔的位置;None 表示放在各語系資料夾
+    if archive:
+        zip_path = os.path.join(save_dir, f"phrase_download_{datetime.now():%Y%m%d_%H%M%S}.zip")
+        output = ZipOutput(zip_path, save_dir, engine.ceiling("bilingualFile"))
+        summary["archive"] = zip_path
+        incremental = compress = False
+        if merge_chunk_size:
+            chunk_dir = tempfile.mkdtemp(prefix="phrase_chunks_")
+    else:
+        output = DirectoryOutput()
+    downloads = queue.Queue(maxsize=DOWNLOAD_QUEUE_SIZE)  # 列表執行緒 → 下載排程;佇列滿時列表執行緒等待
+    listing_failed = [0]  # 列表執行緒的錯誤數,列表結束後才加入 summary,避免兩個執行緒同時修改
+    downloads_stopped = threading.Event()  # 下載端已結束,列表執行緒不必再放入工作
+    progress_lock = threading.Lock()
+    fingerprints = {}  # 下載工作 key → (manifest key, 指紋, 資料夾),下載成功後寫入 manifest
+    remaining_per_project = {}  # 每個專案尚未完成的下載數,用於輸出專案完成訊息
+    listed_projects = set()  # 已列出所有 jobs 的專案,下載數歸零時才算完成
+    merges = {}  # 分段下載的合併工作 key → 暫存分段檔案與尚未完成的分段數
+    chunk_owner = {}  # 分段下載 key → 所屬的合併工作 key
+
+    def enqueue(item, stop_on_cancel=True):
+        """ 放入下載佇列;佇列滿時等待,下載端結束(或取消)後放棄 """
+        while not downloads_stopped.is_set() and not (stop_on_cancel and cancel_event.is_set()):
+            try:
+                downloads.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def add_download(key, manifest_key, fingerprint, job_uids, lang_folder, filename):
+        if compress:
+            # 壓縮與未壓縮的輸出分開記錄,切換設定時不會誤判為未變更
+            manifest_key = f"{manifest_key}:gz"
+            filename += GZIP_SUFFIX
+        action, recorded_path = manifest.plan(manifest_key, fingerprint) if incremental else ("new", None)
+        if action == "skip":
+            with progress_lock:
+                summary["skipped"] += 1
+            return
+        overwrite = action == "overwrite"
+        if overwrite:
+            lang_folder, filename = os.path.split(recorded_path)
+            output.prepare_folder(lang_folder)
+            output.reserve(lang_folder, filename)
+        fingerprints[key] = (manifest_key, fingerprint, lang_folder)
+        with progress_lock:
+            remaining_per_project[key[0]] = remaining_per_project.get(key[0], 0) + 1
+        if not merge_chunk_size or key[3] is not None or len(job_uids) <= merge_chunk_size:
+            enqueue((key, key[0], job_uids, lang_folder, filename, overwrite, output))
+            return
+        # 分段下載到本機暫存檔(直接覆寫,不需另取檔名),合併後才寫入輸出目標
+        chunks = [job_uids[i:i + merge_chunk_size] for i in range(0, len(job_uids), merge_chunk_size)]
+        part_folder = chunk_dir or lang_folder
+        parts = [f".{filename}.{key[0]}.{index:04d}.chunk" for index in range(len(chunks))]
+        merges[key] = {"folder": lang_folder, "filename": filename, "overwrite": overwrite,
+                       "parts": [os.path.join(part_folder, part) for part in parts],
+                       "remaining": len(chunks), "error": None}
+        for index, chunk in enumerate(chunks):
+            chunk_owner[key + (index,)] = key
+            enqueue((key + (index,), key[0], chunk, part_folder, parts[index], True, DIRECTORY_OUTPUT))
+
+    def finish_listing(project):
+        """ 專案的 jobs 全部列出後,若下載也已全部完成則輸出完成訊息 """
+        with progress_lock:
+            listed_projects.add(project['uid'])
+            done = remaining_per_project.get(project['uid']) == 0
+        if done:
+            log(f"專案 {project['name']} 完成\n")
+
+    def listing_stopped():
+        return cancel_event.is_set() or downloads_stopped.is_set()
+
+    def list_downloads():
+        """ 列表執行緒:依序列出每個專案、語言的 jobs 並放入下載佇列,結束時放入 None """
+        try:
+            for project in projects:
+                if listing_stopped():
+                    break
+                list_project(project)
+        finally:
+            # 取消時下載端可能正在等待佇列,結束標記一定要送到
+            enqueue(None, stop_on_cancel=False)
+
+    def list_project(project):
+        project_name = project['name']
+        project_uid = project['uid']
+
+        log(f"處理專案: {project_name}\n")
+
+        # 確定 workflow level 和取得 workflow abbreviation
+        try:
+            workflow_level, workflow_abbr = resolve_workflow(project, workflow_name)
+        except PhraseError as e:
+            log(f"Skip: {e}\n")
+            return
+
+        try:
+            # 每個專案(與工作流程層級)只列出一次 jobs,在本機依 targetLang 分到選定的語言
+            lang_folders = {}
+            for target_lang in target_langs:
+                safe_lang = target_lang.replace('/', '_')
+                # 建立語系資料夾 (加上 workflow 縮寫)
+                if workflow_abbr:
+                    folder_name = f"{safe_lang}_{workflow_abbr}"
+                else:
+                    folder_name = safe_lang
+                lang_folders[target_lang] = (safe_lang, os.path.join(save_dir, folder_name))
+            jobs_by_lang = {target_lang: [] for target_lang in target_langs}
+            # 只選了專案的一個語言時仍由伺服器篩選,避免列出其他語言的 jobs
+            project_langs = [lang for lang in target_langs if lang in project.get('targetLangs', [])]
+            lang_filter = project_langs[0] if len(project_langs) == 1 else None
+
+            # 增量下載以 job 資料的指紋判斷是否變更,必須使用最新的清單,不能使用快取
+            for page in engine.iter_job_pages(project_uid, workflowLevel=workflow_level, targetLang=lang_filter,
+                                              fresh=incremental):
+                if listing_stopped():
+                    return
+                for job in page:
+                    lang_jobs = jobs_by_lang.get(job.get('targetLang'))
+                    if lang_jobs is None:  # 未選擇的語言
+                        continue
+                    lang_jobs.append(job)
+                    if download_mode == MODE_SEPARATE:
+                        # 單獨下載：每個 job 一個檔案,每取得一頁就開始下載該頁的 jobs
+                        safe_lang, lang_folder = lang_folders[job['targetLang']]
+                        if len(lang_jobs) == 1:
+                            output.prepare_folder(lang_folder)
+                        add_job_download(project, job, safe_lang, workflow_abbr, lang_folder)
+            if listing_stopped():
+                return
+
+            for target_lang in target_langs:
+                jobs = jobs_by_lang[target_lang]
+                if not jobs:
+                    log(f"  沒有找到 {target_lang} 的 jobs\n")
+                    continue
+                log(f"  {target_lang}: 找到 {len(jobs)} 個 jobs\n")
+                if download_mode != MODE_MERGED:
+                    continue
+                # 合併下載：一個語言一個檔案,需要完整的 job 清單
+                safe_lang, lang_folder = lang_folders[target_lang]
+                output.prepare_folder(lang_folder)
+                job_uids = [job['uid'] for job in jobs]
+
+                # 建立檔案名稱: 專案名稱_語系_workflow縮寫.mxliff
+                safe_project_name = "".join(c for c in project_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+                if workflow_abbr:
+                    filename = f"{safe_project_name}_{safe_lang}_{workflow_abbr}.mxliff"
+                else:
+                    filename = f"{safe_project_name}_{safe_lang}.mxliff"
+                add_download((project_uid, project_name, target_lang, None),
+                             f"merged:{project_uid}:{target_lang}:{workflow_level}", job_fingerprint(jobs),
+                             job_uids, lang_folder, filename)
+
+        except Exception as e:
+            listing_failed[0] += 1
+            log(f"Error in project {project_name}: {str(e)}\n\n")
+            logging.error(f"Download failed for project {project_name}: {str(e)}")
+        finish_listing(project)
+
+    def add_job_download(project, job, safe_lang, workflow_abbr, lang_folder):
+        job_filename = job.get('filename', 'unknown')
+
+        # 建立檔案名稱: 檔名_語系_workflow縮寫.mxliff
+        # 移除原始檔案的副檔名
+        base_filename = os.path.splitext(job_filename)[0]
+        safe_filename = "".join(c for c in base_filename if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        if not safe_filename:  # 如果過濾後檔名是空的
+            safe_filename = "unnamed"
+
+        if workflow_abbr:
+            filename = f"{safe_filename}_{safe_lang}_{workflow_abbr}.mxliff"
+        else:
+            filename = f"{safe_filename}_{safe_lang}.mxliff"
+        add_download((project['uid'], project['name'], job['targetLang'], job_filename, job['uid']),
+                     job['uid'], job_fingerprint([job]), [job['uid']], lang_folder, filename)
+
+    def queued_downloads():
+        """ 從下載佇列依序取出下載工作,直到列表執行緒放入 None """
+        while True:
+            item = downloads.get()
+            if item is None:
+                return
+            yield item
+
+    def report_download(key, final_filename, result):
+        project_uid, project_name, target_lang, job_filename = key[:4]
+        if job_filename is None:
+            log(f"  [{project_name}] {target_lang}: {result}\n")
+            log_job_event(f"Project {project_name} - Language {target_lang} (merged): {result}",
+                          action="download", project=project_name, project_uid=project_uid, target_lang=target_lang,
+                          file=final_filename, result=result)
+        else:
+            log(f"  [{project_name}] {target_lang} [{job_filename}] → {final_filename}: {result}\n")
+            log_job_event(f"Project {project_name} - Job {job_filename} - Language {target_lang}: {result}",
+                          action="download", project=project_name, project_uid=project_uid, target_lang=target_lang,
+                          job_uid=key[4], job_filename=job_filename, file=final_filename, result=result)
+        # 合併工作在 merge_executor 回報,與下載排程的執行緒同時修改統計
+        with progress_lock:
+            if result.startswith("成功下載到"):
+                summary["downloaded"] += 1
+                if not archive:
+                    manifest_key, fingerprint, lang_folder = fingerprints[key]
+                    manifest.record(manifest_key, fingerprint, os.path.join(lang_folder, final_filename))
+            elif result != "已取消":
+                summary["failed"] += 1
+            remaining_per_project[project_uid] -= 1
+            done = remaining_per_project[project_uid] == 0 and project_uid in listed_projects
+        if done:
+            log(f"專案 {project_name} 完成\n")
+
+    def collect_chunk(key, result):
+        """ 記錄一個分段的結果;所有分段完成後交給 merge_executor 合併,下載排程不必等待合併完成 """
+        merge = merges[key]
+        if not result.startswith("成功下載到") and merge["error"] is None:
+            merge["error"] = result
+        merge["remaining"] -= 1
+        if not merge["remaining"]:
+            merge_futures.append(merge_executor.submit(finish_merge, key, merge))
+
+    def finish_merge(key, merge):
+        """ 合併所有分段為正式檔案並回報(在 merge_executor 執行) """
+        filename = merge["filename"]
+        result = merge["error"]
+        if result is None:
+            try:
+                save_path = output.allocate(merge["folder"], filename, merge["overwrite"])
+                filename = os.path.basename(save_path)
+                merge_mxliff_files(merge["parts"], save_path, output.open)
+                result = f"成功下載到: {save_path}"
+            except (OSError, PhraseError) as e:
+                result = f"Error: {str(e)}"
+        remove_parts(merge)
+        report_download(key, filename, result)
+
+    def remove_parts(merge):
+        for part in merge["parts"]:
+            if os.path.exists(part):
+                os.remove(part)
+
+    # 合併大型檔案可能需要數秒,在獨立的執行緒進行,期間下載排程照常補上新的下載
+    merge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="merge")
+    merge_futures = []
+    lister = threading.Thread(target=list_downloads, name="list-jobs", daemon=True)
+    lister.start()
+    try:
+        # 所有專案與語言共用同一個排程,連線池在專案、語言之間不會閒置
+        try:
+            for key, final_filename, result in engine.download_files(
+                    queued_downloads(), engine.ceiling("bilingualFile"), cancel_event=cancel_event):
+                if key in chunk_owner:
+                    collect_chunk(chunk_owner[key], result)
+                else:
+                    report_download(key, final_filename, result)
+        finally:
+            # 下載端提前結束(取消或錯誤)時,讓列表執行緒不再等待佇列
+            downloads_stopped.set()
+            lister.join()
+            merge_executor.shutdown(wait=True)
+            summary["failed"] += listing_failed[0]
+            if not archive:
+                manifest.save()
+            # 取消或中斷時,未完成合併的分段暫存檔不保留
+            for merge in merges.values():
+                if merge["remaining"]:
+                    remove_parts(merge)
+        for future in merge_futures:
+            future.result()  # 合併時發生未預期的錯誤時在此拋出
+        if summary["skipped"]:
+            log(f"\n{summary['skipped']} 個檔案未變更,略過下載\n")
+    finally:
+        if chunk_dir:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+        if archive:
+            try:
+                output.close()
+                log(f"ZIP 已儲存: {zip_path}\n")
+            except PhraseError as e:
+                # ZIP 無法完成時,已下載的檔案都不算成功
+                summary["failed"] += summary["downloaded"]
+                summary["downloaded"] = 0
+                log(f"Error: {str(e)}\n")
+
+    report_path = METRICS.write_report()
+    if report_path:
+        log(f"效能報告: {report_path}\n")
+    if cancel_event.is_set():
+        log("下載已取消\n")
+    else:
+        log("所有下載完成!\n")
+    return summary
+
+
+def update_all_jobs_status(engine, projects, workflow_name, new_status, log=None, cancel_event=None, resume=True):
+    """ 批量更新選定專案在指定工作流程層級的任務狀態,進度以 log(text) 回報,cancel_event 設定後停止送出新請求
+        所有專案的 setStatus 請求共用同一個執行池:維持固定的同時請求數,每完成一個就送出下一個
+        更新成功的 jobs 寫入 StatusJournal;token 過期時停止送出新請求,重新登入後以相同參數再次執行即可繼續
+        (resume=False 時捨棄記錄)。是否送出一律依最新的 job 狀態判斷,記錄只用來區分先前已完成與原本就是目標狀態的 jobs
+        結束時將本次的 API 效能統計寫入 REPORT_DIR(METRICS.write_report)
+        回傳 {"success": 成功數, "failed": 失敗數, "noop": 已是目標狀態而略過的數量,
+              "resumed": 先前已完成而略過的數量, "token_expired": 是否因 token 過期而中斷}
+    """
+    log = log or discard_log
+    cancel_event = cancel_event or threading.Event()
+    METRICS.begin_run("update_status")
+    totals = {"success": 0, "failed": 0, "noop": 0, "resumed": 0, "token_expired": False}
+    journal = StatusJournal(projects, workflow_name, new_status)
+    if not resume:
+        journal.discard()
+    elif journal.completed:
+        log(f"從先前中斷的記錄繼續:{len(journal.completed)} 個 jobs 已完成,計入「先前已完成」\n")
+    progress = {}  # project uid → 該專案的統計與尚未完成的請求數
+
+    def record_result(state, job, result):
+        job_uid = job["uid"]
+        job_filename = job.get("filename", "N/A")
+        project_name = state["project"]["name"]
+        log(f"{project_name} - {job_filename} ({job_uid}) → {result}\n")
+        if result == STATUS_UPDATED:
+            state["success"] += 1
+            totals["success"] += 1
+            journal.record(job_uid)
+        elif not result.startswith("跳過"):
+            state["fail"] += 1
+            totals["failed"] += 1
+        log_job_event(f"Project {project_name} Job {job_uid} ({job_filename}): {result}",
+                      action="set_status", project=project_name, project_uid=state["project"]["uid"],
+                      job_uid=job_uid, job_filename=job_filename, status=new_status, result=result)
+
+    def finish_project(state):
+        """ 專案的 jobs 全部列出且所有請求完成後,輸出統計並清除 job 清單快取 """
+        if not state["listed"] or state["pending"]:
+            return
+        project = state["project"]
+        # 狀態已變更,清除此專案的 job 清單快取
+        LISTING_CACHE.invalidate_jobs(project['uid'])
+        elapsed_time = time.time() - state["start"]
+        log(
+            f"Project {project['name']}: 成功更新 {state['success']} 個 jobs,失敗 {state['fail']} 個,"
+            f"已是 {new_status} 而略過 {state['noop']} 個,先前已完成 {state['resumed']} 個,"
+            f"耗時 {elapsed_time:.2f} 秒\n\n")
+        logging.info(
+            f"Project {project['name']}: Batch update completed: {state['success']} successful, {state['fail']} failed, "
+            f"{state['noop']} already {new_status}, {state['resumed']} resumed from journal, "
+            f"took {elapsed_time:.2f} seconds")
+
+    def generate_updates():
+        """ 依序列出每個專案的 jobs,逐一產生需要送出的 setStatus 請求 """
+        for project in projects:
+            if cancel_event.is_set():
+                return
+            log(f"Processing project: {project['name']}\n")
+
+            try:
+                workflow_level, _ = resolve_workflow(project, workflow_name)
+            except PhraseError as e:
+                log(f"Skip: {e}\n")
+                continue
+
+            start_time = time.time()
+            try:
+                # 依 status 決定是否略過,必須使用最新的清單,不能使用快取
+                jobs = engine.fetch_jobs(project['uid'], workflowLevel=workflow_level)
+            except TokenExpiredError:
+                totals["token_expired"] = True
+                return
+            except Exception as e:
+                totals["failed"] += 1
+                log(f"Error in project {project['name']}: {str(e)}\n")
+                logging.error(f"Batch update failed for project {project['name']}: {str(e)}")
+                continue
+
+            if not jobs:
+                log(f"No jobs found in project {project['name']}\n")
+                continue
+
+            state = progress[project['uid']] = {
+                "project": project, "start": start_time, "success": 0, "fail": 0,
+                "noop": 0,  # 狀態已是目標狀態而未送出請求的 jobs
+                "resumed": 0,  # 記錄中已完成而未送出請求的 jobs
+                "pending": 0, "listed": False,
+            }
+            for job in jobs:
+                # token 過期或取消後不再送出新請求,未送出的 jobs 留待下次從記錄繼續
+                if cancel_event.is_set() or totals["token_expired"]:
+                    return
+                job_workflow_level = job.get("workflowLevel")
+                # 如果指定了 workflow level,檢查是否匹配
+                if workflow_level is not None and job_workflow_level != workflow_level:
+                    record_result(state, job, f"跳過: 屬於工作流程層級 {job_workflow_level}")
+                    continue
+                # 清單中的 status 已是目標狀態,不需送出 setStatus;記錄中的 jobs 若之後被改回其他狀態則照常送出
+                if job.get("status") == new_status and job["uid"] in journal.completed:
+                    state["resumed"] += 1
+                    totals["resumed"] += 1
+                    continue
+                if job.get("status") == new_status:
+                    state["noop"] += 1
+                    totals["noop"] += 1
+                    record_result(state, job, f"跳過: 狀態已是 {new_status}")
+                    continue
+                state["pending"] += 1
+                yield (project['uid'], job), project['uid'], job["uid"], new_status
+            state["listed"] = True
+            finish_project(state)
+
+    try:
+        for (project_uid, job), result in engine.update_statuses(
+                generate_updates(), engine.ceiling("setStatus"), cancel_event=cancel_event):
+            state = progress[project_uid]
+            state["pending"] -= 1
+            if result == TokenExpiredError.MESSAGE:
+                # 不算失敗:未寫入記錄,重新登入後會再次送出
+                totals["token_expired"] = True
+                continue
+            if result != STATUS_UPDATED:
+                result = f"更新失敗: {result}"
+            record_result(state, job, result)
+            finish_project(state)
+    finally:
+        journal.close()
+        # 取消或中斷時,已送出請求的專案仍需清除快取
+        for project_uid in progress:
+            LISTING_CACHE.invalidate_jobs(project_uid)
+
+    if totals["token_expired"]:
+        log(f"Token 已過期:已完成 {totals['success'] + totals['resumed']} 個 jobs,"
+            f"重新登入後以相同設定再次執行即可從中斷處繼續\n")
+    elif not cancel_event.is_set():
+        # 沒有中斷的執行不保留記錄;失敗的 jobs 狀態未變更,下次執行會依最新狀態再次送出
+        journal.discard()
+
+    report_path = METRICS.write_report()
+    if report_path:
+        log(f"效能報告: {report_path}\n")
+    if cancel_event.is_set():
+        log("狀態更新已取消\n")
+    return totals